@@ -0,0 +1,550 @@
+"""
+Offline benchmark harness for CryptoChecker.py.
+
+Starts a local stand-in for the CoinGecko and CoinCap APIs and points the
+checker at it, then measures the hot paths without touching the network or
+a terminal:
+  • get_coins_list       (top-100 and a full market universe)
+  • get_historical_data  (cold, warm cache, stale-while-revalidate, tail refresh)
+  • search_coins         (and building the SearchIndex)
+  • display_coin_details (cold and warm)
+  • page rendering       (display_coins_page through the diffing renderer)
+
+For each one it reports throughput, p50 / p99 / max latency and peak traced
+memory, as JSON (stdout or --output) plus a readable table on stderr.
+
+The fake server serves recorded payloads from --fixtures DIR (create them
+with --record DIR, which needs network access) or deterministic synthetic
+ones, with optional latency, error and 429 injection.
+
+Usage:
+    python CryptoBench.py [--iterations N] [--latency MS] [--jitter MS]
+                          [--error-rate P] [--rate-429 P] [--fixtures DIR]
+                          [--output FILE] [--baseline FILE]
+    python CryptoBench.py --record DIR
+"""
+import sys
+import os
+import io
+import json
+import time
+import math
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import CryptoChecker as cc
+
+# Configuration
+DEFAULT_ITERATIONS    = 20
+MEMORY_ITERATIONS     = 3       # traced runs per benchmark (tracemalloc is slow)
+UNIVERSE_COINS        = 5000    # coins the fake markets endpoints know about
+UNIVERSE_PAGES        = 8       # MARKET_UNIVERSE_PAGES for the universe benchmark
+HISTORY_WINDOWS       = [1, 7, 30, 365, 'max']
+SEARCH_QUERIES        = ['btc', 'bitcoin', 'eth', 'mon', 'coin 12', 'moner', 'xbt', 'zzzz']
+MS_PER_HOUR           = 3600 * 1000
+REGRESSION_THRESHOLD  = 0.20    # --baseline: flag p50 slowdowns above 20%
+REGRESSION_FLOOR_MS   = 0.05    # …and larger than this, so cache hits don’t flap
+
+# Real coins at the top of the synthetic universe, so search and aliases work
+TOP_COINS = [
+    ('bitcoin', 'btc', 'Bitcoin', 60000.0),
+    ('ethereum', 'eth', 'Ethereum', 3000.0),
+    ('tether', 'usdt', 'Tether', 1.0),
+    ('binancecoin', 'bnb', 'BNB', 550.0),
+    ('solana', 'sol', 'Solana', 150.0),
+    ('ripple', 'xrp', 'XRP', 0.5),
+    ('dogecoin', 'doge', 'Dogecoin', 0.15),
+    ('cardano', 'ada', 'Cardano', 0.45),
+    ('monero', 'xmr', 'Monero', 165.0),
+    ('litecoin', 'ltc', 'Litecoin', 80.0),
+]
+
+
+# ————— Fake API server —————
+def synthetic_universe(count, seed=1):
+    """[(id, symbol, name, price)] ordered by market cap, real coins first."""
+    rng   = random.Random(seed)
+    coins = list(TOP_COINS)
+    for i in range(len(coins), count):
+        coins.append((f"coin-{i}", f"c{i}", f"Coin {i}", round(rng.uniform(0.001, 50), 6)))
+    return coins
+
+
+def synthetic_series(start_ms, end_ms, step_ms, base_price, seed):
+    """Random-walk [[ts, price], ...] between start_ms and end_ms."""
+    rng, price, points = random.Random(seed), base_price, []
+    for ts in range(int(start_ms), int(end_ms) + 1, int(step_ms)):
+        price *= 1 + rng.gauss(0, 0.004)
+        points.append([ts, round(price, 6)])
+    return points
+
+
+def chart_step_ms(days):
+    """CoinGecko’s automatic granularity: 5-minutely, hourly, then daily."""
+    if days != 'max' and days <= 1:
+        return 5 * 60 * 1000
+    if days != 'max' and days <= 90:
+        return MS_PER_HOUR
+    return cc.MS_PER_DAY
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the CoinGecko (/api/v3) and CoinCap (/v2) endpoints the
+    checker uses. Every request first sleeps `latency` ± `jitter` seconds,
+    then fails with 429 (probability rate_429, with Retry-After) or 500
+    (probability error_rate), otherwise answers from the fixtures or with a
+    synthetic payload. Bodies are encoded once and reused, so the server’s
+    own CPU use stays out of the client’s measurements as far as possible.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fixtures=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_429=0.0, retry_after=0, seed=1):
+        super().__init__(('127.0.0.1', 0), FakeApiHandler)
+        self.fixtures    = fixtures or {}
+        self.latency     = latency
+        self.jitter      = jitter
+        self.error_rate  = error_rate
+        self.rate_429    = rate_429
+        self.retry_after = retry_after
+        self.rng         = random.Random(seed)
+        self.universe    = synthetic_universe(UNIVERSE_COINS, seed)
+        self.now_ms      = int(time.time() * 1000)
+        self.counters    = {'requests': 0, 'injected_errors': 0, 'injected_429': 0}
+        self._bodies     = {}
+        self._lock       = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def handle_error(self, request, client_address):
+        # Clients drop pooled or hedged connections all the time; that’s not news
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+    def body(self, key, build):
+        """Encoded JSON body for `key`, built once."""
+        with self._lock:
+            body = self._bodies.get(key)
+        if body is None:
+            body = json.dumps(build()).encode()
+            with self._lock:
+                self._bodies[key] = body
+        return body
+
+    def route(self, path, query):
+        """Return (status, body bytes) for a request."""
+        arg = lambda name, default=None: query.get(name, [default])[0]
+
+        if path == '/api/v3/coins/markets':
+            page, per_page = int(arg('page', 1)), int(arg('per_page', 100))
+            return 200, self.body(('markets', page, per_page), lambda: self.markets(page, per_page))
+        if path.startswith('/api/v3/coins/') and path.endswith('/market_chart/range'):
+            start, end = int(arg('from')) * 1000, int(arg('to')) * 1000
+            return 200, json.dumps(self.chart_range(start, end)).encode()
+        if path.startswith('/api/v3/coins/') and path.endswith('/market_chart'):
+            coin_id, days = path.split('/')[4], arg('days', '1')
+            days = days if days == 'max' else float(days)
+            return 200, self.body(('chart', coin_id, days), lambda: self.market_chart(coin_id, days))
+        if path == '/api/v3/simple/price':
+            prices = {coin_id: price for coin_id, _, _, price in self.universe}
+            return 200, json.dumps({
+                coin_id: {'usd': prices[coin_id], 'usd_24h_change': 1.0}
+                for coin_id in arg('ids', '').split(',') if coin_id in prices
+            }).encode()
+        if path == '/api/v3/exchange_rates':
+            return 200, self.body('fx', lambda: {'rates': {
+                'btc': {'value': 1, 'type': 'crypto'},
+                'usd': {'value': 60000.0, 'type': 'fiat'},
+                'eur': {'value': 55000.0, 'type': 'fiat'},
+            }})
+        if path == '/v2/assets':
+            limit, offset = int(arg('limit', 100)), int(arg('offset', 0))
+            return 200, self.body(('assets', limit, offset), lambda: self.assets(limit, offset))
+        if path.startswith('/v2/assets/') and path.endswith('/history'):
+            start, end = int(arg('start')), int(arg('end'))
+            step = {'m1': 60 * 1000, 'h1': MS_PER_HOUR}.get(arg('interval'), cc.MS_PER_DAY)
+            return 200, json.dumps({'data': [
+                {'priceUsd': str(price), 'time': ts}
+                for ts, price in synthetic_series(start, end, step, 100.0, start)
+            ]}).encode()
+        if path == '/v2/rates':
+            return 200, b'{"data": [{"symbol": "EUR", "rateUsd": "1.09"}]}'
+        return 404, b'{"error": "not found"}'
+
+    def markets(self, page, per_page):
+        if 'markets' in self.fixtures:
+            rows = self.fixtures['markets']
+            return rows[(page - 1) * per_page:page * per_page]
+        rows = self.universe[(page - 1) * per_page:page * per_page]
+        return [{'id': coin_id, 'symbol': symbol, 'name': name, 'current_price': price,
+                 'price_change_percentage_24h': 1.5, 'market_cap': 1e12 / (rank + 1)}
+                for rank, (coin_id, symbol, name, price) in enumerate(rows, (page - 1) * per_page)]
+
+    def assets(self, limit, offset):
+        if 'assets' in self.fixtures:
+            return {'data': self.fixtures['assets']['data'][offset:offset + limit]}
+        rows = self.universe[offset:offset + limit]
+        return {'data': [{'id': coin_id, 'symbol': symbol.upper(), 'name': name,
+                          'priceUsd': str(price), 'changePercent24Hr': '1.5',
+                          'marketCapUsd': str(1e12 / (rank + 1))}
+                         for rank, (coin_id, symbol, name, price) in enumerate(rows, offset)]}
+
+    def market_chart(self, coin_id, days):
+        fixture = self.fixtures.get(f"market_chart_{days if days == 'max' else int(days)}")
+        if fixture:
+            return fixture
+        span   = 4000 * cc.MS_PER_DAY if days == 'max' else days * cc.MS_PER_DAY
+        prices = synthetic_series(self.now_ms - span, self.now_ms, chart_step_ms(days), 100.0, coin_id)
+        volumes = [[ts, price * 1e6] for ts, price in prices]
+        return {'prices': prices, 'market_caps': volumes, 'total_volumes': volumes}
+
+    def chart_range(self, start_ms, end_ms):
+        prices = synthetic_series(start_ms, end_ms, 5 * 60 * 1000, 100.0, start_ms)
+        return {'prices': prices, 'market_caps': prices, 'total_volumes': prices}
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version        = 'HTTP/1.1'
+    disable_nagle_algorithm = True   # headers and body go out in separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        url    = urlparse(self.path)
+        delay  = server.latency + server.rng.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        with server._lock:
+            server.counters['requests'] += 1
+            roll = server.rng.random()
+        headers = {}
+        if roll < server.rate_429:
+            status, body = 429, b'{"error": "rate limited"}'
+            headers['Retry-After'] = str(server.retry_after)
+            server.counters['injected_429'] += 1
+        elif roll < server.rate_429 + server.error_rate:
+            status, body = 500, b'{"error": "injected"}'
+            server.counters['injected_errors'] += 1
+        else:
+            status, body = server.route(url.path, parse_qs(url.query))
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def load_fixtures(directory):
+    """Recorded payloads by name (markets, assets, market_chart_<days>)."""
+    fixtures = {}
+    if directory:
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    fixtures[filename[:-5]] = json.load(f)
+    return fixtures
+
+
+def record_fixtures(directory):
+    """Download one set of real payloads into `directory` (needs network access)."""
+    os.makedirs(directory, exist_ok=True)
+    requests_to_record = {
+        'markets': (f"{cc.COINGECKO_API_BASE}/coins/markets",
+                    {'vs_currency': 'usd', 'order': 'market_cap_desc', 'per_page': 250, 'page': 1}),
+        'assets':  (f"{cc.COINCAP_API_BASE}/assets", {'limit': 2000}),
+    }
+    for days in HISTORY_WINDOWS:
+        requests_to_record[f"market_chart_{days}"] = (
+            f"{cc.COINGECKO_API_BASE}/coins/bitcoin/market_chart", {'vs_currency': 'usd', 'days': days})
+    for name, (url, params) in requests_to_record.items():
+        try:
+            data = cc.http_get(url, params=params).json()
+        except Exception as e:
+            print(f"  {name}: failed ({e})", file=sys.stderr)
+            continue
+        with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        print(f"  {name}: saved", file=sys.stderr)
+# ————————————————————————————————
+
+
+# ————— Measurement —————
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(name, fn, iterations, setup=None):
+    """
+    Run `fn` `iterations` times (calling `setup` untimed before each run):
+      1) a timed pass without tracing → throughput and latency percentiles;
+      2) MEMORY_ITERATIONS traced runs → peak traced memory of a single call.
+    Exceptions count as errors and are excluded from the latencies.
+    """
+    samples, errors = [], 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        if setup:
+            setup(i)
+        t0 = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            errors += 1
+            continue
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for i in range(min(MEMORY_ITERATIONS, iterations)):
+            if setup:
+                setup(i)
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            try:
+                fn(i)
+            except Exception:
+                pass
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    ms = [sample * 1000 for sample in samples]
+    return {
+        'name':       name,
+        'iterations': iterations,
+        'errors':     errors,
+        'total_s':    round(total, 4),
+        'ops_per_s':  round(len(samples) / sum(samples), 2) if samples and sum(samples) else None,
+        'p50_ms':     round(percentile(ms, 50), 3) if ms else None,
+        'p99_ms':     round(percentile(ms, 99), 3) if ms else None,
+        'max_ms':     round(max(ms), 3) if ms else None,
+        'peak_kib':   round(peak / 1024, 1),
+    }
+# ————————————————————————————————
+
+
+# ————— Benchmarks —————
+def reset_state():
+    """Forget caches, breakers and snapshots so every benchmark starts alike."""
+    cc.historical_cache.clear()
+    cc.coins_cache.clear()
+    cc.dirty_series.clear()
+    cc.provider_registry.providers.clear()
+    clear_disk_cache()
+
+
+def clear_disk_cache():
+    db = cc.get_db()
+    if db:
+        with cc._db_lock:
+            db.execute("DELETE FROM historical")
+            db.execute("DELETE FROM coins_list")
+            db.commit()
+
+
+def run_benchmarks(iterations):
+    """Run every benchmark; returns the list of result dicts."""
+    results = []
+    sink    = io.StringIO()
+
+    def quiet(fn):
+        """Run fn with its screen output captured (and discarded)."""
+        def run(i):
+            with redirect_stdout(sink):
+                fn(i)
+            sink.seek(0)
+            sink.truncate()
+        return run
+
+    # Top-100 list and the full market universe (always refetched)
+    reset_state()
+    results.append(measure('get_coins_list.top100', quiet(
+        lambda i: cc.get_coins_list(force=True, background=True)), iterations))
+    cc.MARKET_UNIVERSE_PAGES = UNIVERSE_PAGES
+    try:
+        reset_state()
+        results.append(measure(f'get_coins_list.universe_{UNIVERSE_PAGES}p', quiet(
+            lambda i: cc.get_coins_list(force=True, background=True)), max(3, iterations // 4)))
+        universe = cc.coins_list
+    finally:
+        cc.MARKET_UNIVERSE_PAGES = 0
+
+    # Historical series: cold (nothing cached), warm (memory hit), stale (expired,
+    # served while revalidating), tail (expired → delta fetched in the foreground)
+    for days in HISTORY_WINDOWS:
+        def cold_setup(i):
+            cc.historical_cache.clear()
+            clear_disk_cache()
+        results.append(measure(f'get_historical_data.cold.{days}',
+                               lambda i, d=days: cc.get_historical_data('bitcoin', d),
+                               iterations, setup=cold_setup))
+        results.append(measure(f'get_historical_data.warm.{days}',
+                               lambda i, d=days: cc.get_historical_data('bitcoin', d), iterations))
+
+        def expire(i, d=days):
+            key = f"bitcoin_{d}"
+            cc.historical_cache.put(key, cc.historical_cache.peek(key), ttl=0)
+        results.append(measure(f'get_historical_data.stale.{days}',
+                               lambda i, d=days: cc.get_historical_data('bitcoin', d),
+                               iterations, setup=expire))
+        while cc.fetch_flights.in_flight(f"bitcoin_{days}"):   # let the last revalidation land
+            time.sleep(0.01)
+        cc.STALE_WHILE_REVALIDATE = False   # measure the delta fetch itself
+        try:
+            results.append(measure(f'get_historical_data.tail.{days}',
+                                   lambda i, d=days: cc.get_historical_data('bitcoin', d),
+                                   iterations, setup=expire))
+        finally:
+            cc.STALE_WHILE_REVALIDATE = True
+
+    # Search over the universe snapshot
+    results.append(measure('search_index.build', lambda i: cc.SearchIndex(universe),
+                           max(3, iterations // 4)))
+    cc.get_search_index(universe)
+    results.append(measure('search_coins', lambda i: cc.search_coins(
+        SEARCH_QUERIES[i % len(SEARCH_QUERIES)], universe), iterations * 10))
+
+    # Coin details screen: cold (every series fetched) and warm
+    cc.coins_list = universe
+    coin = universe[0]
+    results.append(measure('display_coin_details.cold', quiet(lambda i: cc.display_coin_details(coin)),
+                           max(3, iterations // 4), setup=lambda i: reset_state()))
+    results.append(measure('display_coin_details.warm', quiet(lambda i: cc.display_coin_details(coin)),
+                           iterations))
+
+    # Page rendering through the diffing renderer, paging through the universe
+    pages = max(1, len(universe) // cc.COINS_PER_PAGE)
+
+    def render_page(i):
+        with cc.renderer.frame():
+            cc.display_coins_page(i % pages, universe)
+
+    cc.renderer.reset()
+    results.append(measure('render.page', quiet(render_page), iterations * 10))
+    return results
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print p50 changes against a previous JSON run; returns the regressed names."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {entry['name']: entry for entry in json.load(f).get('results', [])}
+    regressed = []
+    for entry in results:
+        before = baseline.get(entry['name'], {}).get('p50_ms')
+        if not before or entry['p50_ms'] is None:
+            continue
+        change = entry['p50_ms'] / before - 1
+        slower = change > threshold and entry['p50_ms'] - before > REGRESSION_FLOOR_MS
+        flag   = '  ← regression' if slower else ''
+        print(f"{entry['name']:<40} {before:>10.3f} → {entry['p50_ms']:>10.3f} ms ({change:+.0%}){flag}",
+              file=sys.stderr)
+        if slower:
+            regressed.append(entry['name'])
+    return regressed
+
+
+def print_table(results):
+    print(f"\n{'benchmark':<40} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10} {'err':>4}",
+          file=sys.stderr)
+    for entry in results:
+        cells = [entry['ops_per_s'], entry['p50_ms'], entry['p99_ms'], entry['peak_kib']]
+        cells = [f"{value:>10}" if value is not None else f"{'-':>10}" for value in cells]
+        print(f"{entry['name']:<40} {' '.join(cells)} {entry['errors']:>4}", file=sys.stderr)
+# ————————————————————————————————
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for CryptoChecker.py")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--latency', type=float, default=0.0, help="server latency per request (ms)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="± random latency (ms)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probability of a 500 answer")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="probability of a 429 answer")
+    parser.add_argument('--retry-after', type=int, default=0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--keep-rate-limits', action='store_true',
+                        help="keep the client’s real token-bucket limits (slow by design)")
+    parser.add_argument('--fixtures', help="directory of recorded payloads to replay")
+    parser.add_argument('--record', metavar='DIR', help="record real payloads into DIR and exit")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--baseline', help="previous JSON results to compare against")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_fixtures(args.record)
+        return 0
+
+    server = FakeApiServer(load_fixtures(args.fixtures), args.latency / 1000, args.jitter / 1000,
+                           args.error_rate, args.rate_429, args.retry_after, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Point the checker at the fake server, with its own throwaway disk cache
+    workdir = tempfile.mkdtemp(prefix='cryptobench-')
+    cc.COINGECKO_API_BASE = f"{server.base_url}/api/v3"
+    cc.COINCAP_API_BASE   = f"{server.base_url}/v2"
+    cc.CACHE_DB_PATH      = os.path.join(workdir, 'cache.db')
+    if not args.keep_rate_limits:
+        cc.RATE_LIMITS        = {}
+        cc.RATE_LIMIT_DEFAULT = (1e6, 1e6)
+    random.seed(args.seed)
+
+    print(f"Fake API on {server.base_url}, {args.iterations} iterations…", file=sys.stderr)
+    results = run_benchmarks(args.iterations)
+    server.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp':  time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python':     platform.python_version(),
+            'platform':   platform.platform(),
+            'numpy':      cc.np is not None,
+            'iterations': args.iterations,
+            'latency_ms': args.latency,
+            'jitter_ms':  args.jitter,
+            'error_rate': args.error_rate,
+            'rate_429':   args.rate_429,
+            'fixtures':   args.fixtures,
+        },
+        'server':  server.counters,
+        'results': results,
+    }
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        print(file=sys.stderr)
+        if compare(results, args.baseline):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,28 +12,173 @@ except ImportError:
 
 import time
 import os
+import json
+import math
+import random
+import re
+import sqlite3
+import threading
+import io
+import shutil
+import socket
+import socketserver
+import ssl
+import select
+import struct
+import base64
+import hashlib
+import argparse
+import csv
+import cProfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager, redirect_stdout
+from email.utils import parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
+# Optional: NumPy speeds up PriceSeries math; plain typed arrays are used without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Configuration
 REFRESH_RATE          = 60    # seconds between automatic top-100 refreshes
-HIST_CACHE_TTL        = 3     # seconds to keep historical data before re-fetch
+REFRESH_LEAD_TIME     = 5     # the background refresher fetches this long before expiry
+REFRESH_RETRY_DELAY   = 10    # seconds before the refresher retries a failed refresh
+QUOTE_REFRESH_RATE    = 10    # seconds between batched price updates of the visible page
+# Seconds to keep historical data before re-fetch, per timeframe: an all-time
+# series barely moves, a 24h series goes stale within a minute.
+HIST_CACHE_TTL        = {1: 60, 7: 300, 30: 900, 90: 1800, 365: 3600, 'max': 4 * 3600}
+HIST_CACHE_MAX_BYTES  = 32 * 1024 * 1024   # memory budget for cached series (LRU-evicted)
+COINS_CACHE_MAX_BYTES = 4 * 1024 * 1024    # memory budget for cached top-100 lists
+HIST_SCREEN_DEADLINE  = 15    # seconds the coin-details screen waits for all timeframes
+MS_PER_DAY            = 86400000
+
+# Which downloaded series each trend window is resampled from (see resample_prices).
+# Short windows need the 5-minute resolution of days=1; everything longer is
+# sliced out of the single all-time series.
+HIST_SOURCE_DAYS = {1: 1, 7: 'max', 30: 'max', 90: 'max', 365: 'max', 'max': 'max'}
+
+# Trend windows as (key, label, days); the keys are also --timeframes names
+TIME_FRAMES = [
+    ('24h', 'Past 24h',    1),
+    ('7d',  'Past 7d',     7),
+    ('1m',  'Past 1m',    30),
+    ('3m',  'Past 3m',    90),
+    ('1y',  'Past 1y',   365),
+    ('max', 'All Time',  'max'),
+]
+
+# Headless batch mode (see batch_query)
+BATCH_CHUNK_SIZE      = 200   # queries resolved together: one quote batch, shared histories
+BATCH_WORKERS         = 8     # concurrent history downloads
+
+# Server mode (see CheckerHTTPServer): one fetch/cache core for many local clients
+SERVE_HOST            = '127.0.0.1'
+SERVE_PORT            = 8780
 
 last_update           = 0
 coins_list            = []
 current_page          = 0
 COINS_PER_PAGE        = 10
+RENDER_PROMPT_ROWS    = 4     # rows kept free under a diffed frame (prompt, input echo, search prompt)
 
-# Which API is preferred first for top-100 coin list
-coinlist_primary_api  = "CoinGecko"
+# Market universe: 0 keeps the classic top-100 list; N streams CoinGecko pages
+# 1..N of 250 coins each (CoinCap: the same number of coins in pages of 2000)
+MARKET_UNIVERSE_PAGES = 0
+MARKET_PAGE_SIZE      = 250
+COINCAP_PAGE_SIZE     = 2000
+MARKET_FETCH_WORKERS  = 4     # concurrent page downloads (still rate limited)
+
+# Batched quotes (CoinGecko /simple/price, CoinCap /assets?ids=): coin ids whose
+# prices are kept fresh every QUOTE_REFRESH_RATE seconds besides the visible page
+WATCHLIST             = []    # e.g. ['bitcoin', 'ethereum']
+QUOTE_BATCH_SIZE      = 100   # ids per request (keeps URLs well under length limits)
+
+# Live prices: CoinCap’s WebSocket stream pushes USD price ticks for the
+# listed coins (L in the main menu). Point LIVE_PRICES_URL at a local replay
+# server (python CryptoChecker.py --replay FILE [PORT]) to test offline.
+LIVE_PRICES_URL       = "wss://ws.coincap.io/prices"
+LIVE_MAX_ASSETS       = 100   # coins subscribed to, from the top of the list (plus WATCHLIST)
+LIVE_IDLE_TIMEOUT     = 30    # seconds without a message before reconnecting
+LIVE_RECONNECT_MAX    = 30    # cap for the reconnect backoff in seconds
+LIVE_RECORD_FILE      = None  # append received ticks here, in replay format
+LIVE_REPLAY_PORT      = 8765
+LIVE_REPLAY_INTERVAL  = 0.5   # seconds between replayed lines that carry no "at" time
+
+# API base URLs
+COINGECKO_API_BASE    = "https://api.coingecko.com/api/v3"
+COINCAP_API_BASE      = "https://api.coincap.io/v2"
+
+# HTTP transport (see http_get): pooled keep-alive sessions, retries with
+# exponential backoff + jitter, and a token-bucket rate limit per provider.
+HTTP_TIMEOUT          = 10    # seconds per request attempt
+HTTP_MAX_RETRIES      = 2     # extra attempts after a failed request
+HTTP_BACKOFF_BASE     = 0.5   # first backoff delay in seconds (doubles every retry)
+HTTP_BACKOFF_MAX      = 8     # longest sleep before a retry; a longer Retry-After fails the call
+HTTP_POOL_SIZE        = 8     # keep-alive connections per host
+STREAM_CHUNK_SIZE     = 64 * 1024   # bytes per read when streaming market_chart bodies
+
+# Token-bucket limits per provider: (requests per second, burst size)
+RATE_LIMITS = {
+    'CoinGecko': (0.5, 5),    # public API allows roughly 30 calls/min
+    'CoinCap':   (3, 10),
+}
+RATE_LIMIT_DEFAULT    = (2, 5)
+
+# Which API is preferred first for top-100 coin list: "CoinGecko", "CoinCap",
+# or "Auto" to let the measured provider latencies decide (see rank_providers)
+coinlist_primary_api  = "Auto"
 
 # Which API was last used successfully for get_coins_list()
 active_api            = None
 
-# Tracking which API to try first for historical data
-historical_primary_api = "CoinGecko"
+# Hedged requests (see hedged_fetch): if the first provider hasn't answered
+# within its p-th percentile latency, the next one is raced against it.
+HEDGE_PERCENTILE      = 95    # latency percentile used as the hedge budget
+HEDGE_DEFAULT_BUDGET  = 2.0   # seconds, until a provider has enough samples
+HEDGE_MIN_SAMPLES     = 5
+
+# Circuit breakers per provider (see ProviderRegistry): a provider whose recent
+# error rate is too high is skipped outright and probed in the background.
+CIRCUIT_WINDOW        = 20    # recent calls kept for the rolling error rate
+CIRCUIT_MIN_CALLS     = 4     # calls needed before a breaker may open
+CIRCUIT_ERROR_RATE    = 0.5   # open the breaker at this error rate
+CIRCUIT_OPEN_SECONDS  = 30    # cool-down before an open breaker is probed
+LATENCY_EWMA_ALPHA    = 0.2   # weight of the newest sample in the latency EWMA
 
-# Cache for historical data: { coin_id: { 'ts': timestamp, 'prices': [...] } }
-historical_cache      = {}
+# In-memory caches (historical_cache, coins_cache) are LRUCache instances,
+# created right after the class definition below.
+
+# Persistent on-disk cache (SQLite) so a restart doesn't start cold.
+# Each stored entry carries its own TTL (HIST_CACHE_TTL); stale entries are
+# refreshed by fetching only the tail since their last timestamp.
+CACHE_DB_PATH         = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crypto_cache.db')
+DISK_COINS_TTL        = REFRESH_RATE
+
+# True while the latest background refresh failed and coins_list is stale
+last_refresh_failed   = False
+
+# Currency layer: prices, market caps and histories are fetched once in
+# BASE_CURRENCY and converted locally with one FX table (see get_fx_rates),
+# so switching currency is instant and CoinCap’s USD prices come out right.
+BASE_CURRENCY         = 'usd'
+FX_RATES_TTL          = 3600  # seconds before the FX table is refreshed
+fx_rates              = {'ts': 0, 'rates': {}}   # currency → units per BASE_CURRENCY
+
+# Instrumentation (see Metrics): timing spans and counters on the hot paths,
+# shown with --stats and exported in the Prometheus text format.
+STATS_OVERLAY         = False  # --stats: timings and cache hit rates under the main screen
+METRICS_FILE          = None   # --metrics-file: Prometheus text file, rewritten periodically
+METRICS_PORT          = None   # --metrics-port: serve /metrics on 127.0.0.1
+METRICS_INTERVAL      = 15     # seconds between METRICS_FILE rewrites
+METRICS_SAMPLES       = 512    # recent durations kept per span for percentiles
+PROFILE_FILE          = None   # --profile: cProfile stats per session (pstats format)
 
 # Globals to track first run and chosen currency
 #   We will set:
@@ -101,12 +246,500 @@ EXCHANGE_PAIRS = {
     # Add more pairs if needed
 }
 
-# Network fee sources
+# Extra names that should resolve to a coin id (see CoinRegistry)
+COIN_ALIASES = {
+    'xbt':      'bitcoin',
+    'usdt':     'tether',
+    'usdc':     'usd-coin',
+    'bnb':      'binancecoin',
+    'matic':    'matic-network',
+    'pol':      'matic-network',
+    'avax':     'avalanche-2',
+    'polygon':  'matic-network',
+    'avalanche': 'avalanche-2',
+}
+
+# Network fee sources per chain, tried in order until one answers (parsers in
+# FEE_PARSERS, by source name). All chains are polled concurrently in the
+# background (see FeeEstimator), so the fee screen reads them from memory.
 FEE_API_ENDPOINTS = {
-    'btc': 'https://mempool.space/api/v1/fees/recommended',
-    'eth': 'https://ethgasstation.info/api/ethgasAPI.json',
-    'xmr': 'https://localmonero.co/blocks/api/get_stats',
+    'btc': [
+        ('mempool.space',    'https://mempool.space/api/v1/fees/recommended'),
+        ('blockstream.info', 'https://blockstream.info/api/fee-estimates'),
+    ],
+    'eth': [
+        ('beaconcha.in',     'https://beaconcha.in/api/v1/execution/gasnow'),
+        ('ethgasstation',    'https://ethgasstation.info/api/ethgasAPI.json'),
+    ],
+    'xmr': [
+        ('xmrchain.net',     'https://xmrchain.net/api/networkinfo'),
+        ('localmonero',      'https://localmonero.co/blocks/api/get_stats'),
+    ],
 }
+FEE_REFRESH_RATE = 60    # seconds between fee polls
+FEE_STALE_AFTER  = 300   # estimates older than this are flagged as stale
+FEE_TIMEOUT      = 5     # seconds per fee request (no retries: the next source is tried)
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache bounded by an approximate size in bytes.
+    Entries expire after their own TTL; when the budget is exceeded the least
+    recently used entries are evicted. hits / misses / evictions are counted
+    so the cache can be inspected at runtime.
+
+    Expired entries are not dropped by get(): they stay (and count toward the
+    budget) until replaced or evicted, so peek() can hand them back as the
+    base for an incremental refresh.
+    """
+
+    def __init__(self, max_bytes, default_ttl=60):
+        self.max_bytes   = max_bytes
+        self.default_ttl = default_ttl
+        self.bytes       = 0
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+        self._entries    = OrderedDict()   # key → (expires_at, size, value)
+        self._lock       = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value, or `default` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= time.time():
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def peek(self, key, default=None):
+        """Return the value even if expired (not counted as a hit or miss)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[2]
+
+    def expiry(self, key):
+        """Expiry time (epoch seconds) of `key`, past or future; None if missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, value, ttl=None):
+        """Insert or replace `key`, then evict LRU entries until within budget."""
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            expires = time.time() + (self.default_ttl if ttl is None else ttl)
+            self._entries[key] = (expires, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key):
+        """Drop `key` if present (e.g. to force a refresh)."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Snapshot of the counters: entries, bytes, hits, misses, evictions."""
+        with self._lock:
+            return {
+                'entries':   len(self._entries),
+                'bytes':     self.bytes,
+                'hits':      self.hits,
+                'misses':    self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Live (unexpired) membership; not counted and doesn't touch LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.time()
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+
+def estimate_size(obj):
+    """Rough deep size in bytes of cached values (lists, dicts, numbers, strings)."""
+    if hasattr(obj, 'nbytes'):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+historical_cache = LRUCache(HIST_CACHE_MAX_BYTES)
+coins_cache      = LRUCache(COINS_CACHE_MAX_BYTES, default_ttl=REFRESH_RATE)
+
+# Request coalescing (see SingleFlight): concurrent get_coins_list /
+# get_historical_data callers share one fetch, and an expired entry is served
+# at once while a single background refresh runs (stale-while-revalidate).
+STALE_WHILE_REVALIDATE = True
+STALE_GRACE_FACTOR    = 4     # serve expired data for up to this many TTLs past expiry
+REVALIDATE_WORKERS    = 4     # background refreshes running at once
+
+# Keys of historical series known to be behind (served stale after a failed
+# refresh); anything else in historical_cache is clean as of its last fetch.
+dirty_series     = set()
+
+
+class PriceSeries:
+    """
+    Compact price history: millisecond timestamps and prices held in two
+    parallel typed buffers (NumPy arrays if installed, otherwise memoryviews
+    over array('q') / array('d')) instead of a list of [ts, price] lists.
+
+    Slicing, by index or by time, returns a view over the same buffers.
+    Indexing yields (ts, price) pairs, so code written for the old list
+    format (prices[0][1], prices[-1][0]) keeps working.
+    """
+
+    __slots__ = ('timestamps', 'prices')
+
+    def __init__(self, timestamps=(), prices=()):
+        if np is not None:
+            self.timestamps = np.asarray(timestamps, dtype=np.int64)
+            self.prices     = np.asarray(prices, dtype=np.float64)
+        else:
+            self.timestamps = _typed_view(timestamps, 'q')
+            self.prices     = _typed_view(prices, 'd')
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Build from API-style [[ts, price], ...]; points with no price are skipped."""
+        points = [(int(ts), float(price)) for ts, price in pairs if price is not None]
+        return cls([ts for ts, _ in points], [price for _, price in points])
+
+    @classmethod
+    def from_blob(cls, blob):
+        """Inverse of to_blob(): all timestamps, then all prices, 8 bytes each."""
+        count = len(blob) // 16
+        if np is not None:
+            return cls(np.frombuffer(blob, dtype=np.int64, count=count),
+                       np.frombuffer(blob, dtype=np.float64, count=count, offset=count * 8))
+        timestamps, prices = array('q'), array('d')
+        timestamps.frombytes(blob[:count * 8])
+        prices.frombytes(blob[count * 8:count * 16])
+        return cls(memoryview(timestamps), memoryview(prices))
+
+    def to_blob(self):
+        return self.timestamps.tobytes() + self.prices.tobytes()
+
+    def to_pairs(self):
+        return [[ts, price] for ts, price in zip(self.timestamps.tolist(), self.prices.tolist())]
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.prices.nbytes
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        return zip(self.timestamps.tolist(), self.prices.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PriceSeries(self.timestamps[index], self.prices[index])
+        return int(self.timestamps[index]), float(self.prices[index])
+
+    def __repr__(self):
+        return f"PriceSeries({len(self)} points)"
+
+    def index_at(self, ts_ms, right=False):
+        """Binary search: position of the first point at (or, if right, after) ts_ms."""
+        if np is not None:
+            return int(np.searchsorted(self.timestamps, ts_ms, 'right' if right else 'left'))
+        return (bisect_right if right else bisect_left)(self.timestamps, ts_ms)
+
+    def between(self, start_ms=None, end_ms=None):
+        """View of the points with start_ms <= ts <= end_ms (either bound optional)."""
+        lo = 0 if start_ms is None else self.index_at(start_ms)
+        hi = len(self) if end_ms is None else self.index_at(end_ms, right=True)
+        return self[lo:hi]
+
+    def concat(self, other):
+        """New series with `other`’s points appended (copies both)."""
+        if np is not None:
+            return PriceSeries(np.concatenate((self.timestamps, other.timestamps)),
+                               np.concatenate((self.prices, other.prices)))
+        return PriceSeries(array('q', self.timestamps) + array('q', other.timestamps),
+                           array('d', self.prices) + array('d', other.prices))
+
+    def step(self):
+        """Typical spacing (ms) between points: median of the last few gaps, 0 if unknown."""
+        timestamps = self.timestamps[-9:].tolist()
+        gaps = sorted(b - a for a, b in zip(timestamps, timestamps[1:]))
+        return gaps[len(gaps) // 2] if len(gaps) >= 2 else 0
+
+    def merge_tail(self, tail):
+        """
+        New series with the points of `tail` after our last timestamp, thinned
+        to our own step so a daily series stays daily however fine the tail is:
+          • the first tail point of each new step-sized bucket is kept;
+          • the newest point is always kept as the live price, replacing our
+            last point if that one was already a live point (second in its bucket).
+        Grows by one point per step, so the series stays bounded.
+        """
+        if not len(self):
+            return tail
+        tail = tail.between(start_ms=self[-1][0] + 1)
+        step = self.step()
+        if not len(tail) or not step:
+            return self.concat(tail)
+
+        base = self
+        if len(self) > 1 and self[-2][0] // step == self[-1][0] // step:
+            base = self[:-1]
+        bucket = base[-1][0] // step
+        kept_ts, kept_prices = [], []
+        for ts, price in tail:
+            if ts // step > bucket:
+                bucket = ts // step
+                kept_ts.append(ts)
+                kept_prices.append(price)
+        newest = tail[-1]
+        if not kept_ts or kept_ts[-1] != newest[0]:
+            kept_ts.append(newest[0])
+            kept_prices.append(newest[1])
+        return base.concat(PriceSeries(kept_ts, kept_prices))
+
+    def scaled(self, factor):
+        """New series with every price multiplied by `factor` (currency conversion)."""
+        if factor == 1:
+            return self
+        if np is not None:
+            return PriceSeries(self.timestamps, self.prices * factor)
+        return PriceSeries(self.timestamps, array('d', (price * factor for price in self.prices)))
+
+    def change(self):
+        """Percentage change between the first and last point (0 if undefined)."""
+        if len(self) < 2 or not self.prices[0]:
+            return 0
+        return (float(self.prices[-1]) - float(self.prices[0])) / float(self.prices[0]) * 100
+
+    def min(self):
+        if not len(self):
+            return None
+        return float(self.prices.min()) if np is not None else min(self.prices)
+
+    def max(self):
+        if not len(self):
+            return None
+        return float(self.prices.max()) if np is not None else max(self.prices)
+
+    def returns(self):
+        """Step-to-step simple returns (len - 1 values)."""
+        if np is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return self.prices[1:] / self.prices[:-1] - 1
+        return array('d', ((b / a - 1) if a else 0.0 for a, b in zip(self.prices, self.prices[1:])))
+
+
+class Coin:
+    """
+    One row of a CoinTable as a slotted view. Fields are read from the
+    table’s columns on access, so no per-row dict is allocated and a Coin
+    never goes stale when the table’s prices are updated in place. Price and
+    market cap are converted to the table’s display currency.
+    Supports the coin['price'] / coin.get('price') access of the old dicts.
+    """
+
+    __slots__ = ('table', 'idx')
+
+    FIELDS = ('id', 'name', 'symbol', 'price', 'emoji', 'price_change_24h', 'market_cap')
+
+    def __init__(self, table, idx):
+        self.table = table
+        self.idx   = idx
+
+    id               = property(lambda self: self.table.ids[self.idx])
+    name             = property(lambda self: self.table.names[self.idx])
+    symbol           = property(lambda self: self.table.symbols[self.idx])
+    emoji            = property(lambda self: self.table.emojis[self.idx])
+    price            = property(lambda self: self.table.prices[self.idx] * self.table.rate)
+    price_change_24h = property(lambda self: self.table.changes[self.idx])
+    market_cap       = property(lambda self: self.table.market_caps[self.idx] * self.table.rate)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return f"Coin({self.id!r}, price={self.price})"
+
+
+class CoinTable:
+    """
+    Column-oriented coin list: one list / typed array per field instead of a
+    dict per coin. It behaves like a read-only list of coins, but rows are
+    Coin views created on access, so paging through thousands of coins
+    touches just the rows on screen.
+
+    A refresh that returns the same coins in the same order is applied in
+    place (update_from), as are batched quotes for a few coins
+    (update_quotes), so the table, its Coin views, registry and search index
+    all survive the refresh; `version` counts those updates.
+
+    Prices and market caps are stored in BASE_CURRENCY; Coin views multiply
+    them by `rate`, read from the FX table when displayed, so a currency
+    switch or a late FX update shows up on the next render.
+    """
+
+    __slots__ = ('ids', 'names', 'symbols', 'emojis', 'prices', 'changes', 'market_caps',
+                 'version', '_positions')
+
+    def __init__(self):
+        self.version     = 0
+        self._positions  = None   # id → row, built on first update_quotes()
+        self.ids         = []
+        self.names       = []
+        self.symbols     = []
+        self.emojis      = []
+        self.prices      = array('d')
+        self.changes     = array('d')
+        self.market_caps = array('d')
+
+    @classmethod
+    def from_rows(cls, rows):
+        table = cls()
+        for row in rows:
+            table.append(row['id'], row['name'], row['symbol'], row['emoji'],
+                         row['price'], row['price_change_24h'], row.get('market_cap', 0))
+        return table
+
+    def append(self, coin_id, name, symbol, emoji, price, change, market_cap=0):
+        self._positions = None
+        self.ids.append(coin_id)
+        self.names.append(name)
+        self.symbols.append(symbol)
+        self.emojis.append(emoji)
+        self.prices.append(float(price or 0))
+        self.changes.append(float(change or 0))
+        self.market_caps.append(float(market_cap or 0))
+
+    def extend(self, other):
+        self._positions = None
+        self.ids.extend(other.ids)
+        self.names.extend(other.names)
+        self.symbols.extend(other.symbols)
+        self.emojis.extend(other.emojis)
+        self.prices.extend(other.prices)
+        self.changes.extend(other.changes)
+        self.market_caps.extend(other.market_caps)
+
+    @property
+    def rate(self):
+        """Units of the display currency per BASE_CURRENCY (see local_currency)."""
+        return currency_rate(local_currency())
+
+    def update_from(self, other):
+        """
+        Copy prices, 24h changes and market caps from `other` in place if it
+        lists the same coins in the same order. Each column is replaced with a
+        single slice assignment. Returns False (and changes nothing) otherwise.
+        """
+        if other.ids != self.ids:
+            return False
+        self.prices[:]      = other.prices
+        self.changes[:]     = other.changes
+        self.market_caps[:] = other.market_caps
+        self.version += 1
+        return True
+
+    def update_quotes(self, quotes):
+        """
+        Merge batched quotes {id: (price, change_24h)} into the price columns
+        in place; a change of None keeps the current one. Ids not in the table
+        are ignored. Returns the number of rows updated.
+        """
+        if self._positions is None:
+            self._positions = {coin_id: idx for idx, coin_id in enumerate(self.ids)}
+        updated = 0
+        for coin_id, (price, change) in quotes.items():
+            idx = self._positions.get(coin_id)
+            if idx is None:
+                continue
+            self.prices[idx] = price
+            if change is not None:
+                self.changes[idx] = change
+            updated += 1
+        if updated:
+            self.version += 1
+        return updated
+
+    def row(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('coin index out of range')
+        return Coin(self, idx)
+
+    def to_rows(self):
+        """Rows in BASE_CURRENCY (the inverse of from_rows)."""
+        return [{'id': coin_id, 'name': name, 'symbol': symbol, 'emoji': emoji, 'price': price,
+                 'price_change_24h': change, 'market_cap': market_cap}
+                for coin_id, name, symbol, emoji, price, change, market_cap
+                in zip(self.ids, self.names, self.symbols, self.emojis,
+                       self.prices, self.changes, self.market_caps)]
+
+    @property
+    def nbytes(self):
+        strings = sum(sys.getsizeof(value) for column in (self.ids, self.names, self.symbols, self.emojis)
+                      for value in column)
+        return strings + self.prices.itemsize * len(self.prices) * 3
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (self.row(idx) for idx in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(idx) for idx in range(*index.indices(len(self)))]
+        return self.row(index)
+
+
+def _typed_view(values, typecode):
+    """Zero-copy memoryview over `values`, packing them into an array first if needed."""
+    if isinstance(values, memoryview):
+        return values
+    if not isinstance(values, array) or values.typecode != typecode:
+        values = array(typecode, values)
+    return memoryview(values)
 
 
 def detect_platform():
@@ -125,6 +758,7 @@ def any_key():
     """Universal 'press any key' implementation."""
     print("\nPress Enter to continue…")
     input()
+    renderer.reset()   # the message and prompt may have scrolled the screen
 
 
 def first_run_setup():
@@ -153,8 +787,344 @@ def first_run_setup():
 
 
 def clear_screen():
-    """Clear terminal screen."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    """
+    Clear terminal screen with ANSI codes (one write, no subprocess). On
+    Windows the first call still runs `cls`, which also switches the console
+    into ANSI mode.
+    """
+    global _console_ready
+    if os.name == 'nt' and not _console_ready:
+        os.system('cls')
+        _console_ready = True
+    else:
+        write_terminal('\033[H\033[2J')
+    renderer.reset()
+
+
+_console_ready = False
+
+
+# ————— Instrumentation —————
+class Metrics:
+    """
+    Process-wide timing spans and counters for the hot paths.
+      • span(name, **labels) times a block; per name + labels it keeps the
+        count, total and the last METRICS_SAMPLES durations (for p50 / p95).
+        A block that raises still counts, and bumps `<name>_errors`.
+      • count(name, **labels) increments a counter.
+    Spans in use:
+      http_wait         token-bucket wait before an attempt (provider)
+      http_connect      new connection: DNS + TCP + TLS (host)
+      http_tcp_connect  the DNS + TCP part of it (host)
+      http_request      one attempt, up to the headers (the whole body unless streamed)
+      http_backoff      sleep before a retry (provider)
+      provider_call     one provider fetch incl. parsing (op, provider)
+      parse             JSON decoding; streamed bodies include the download (op)
+      frame / render    building a screen / diffing and writing it
+    Counters: http_retries (provider, reason), provider_call_errors,
+    history_lookups (source: memory, disk, revalidate, tail, full, stale,
+    failed), coalesced_calls,
+    fee_lookups (chain, result) and render_bytes. to_prometheus() adds the
+    LRU caches’ own hit / miss / eviction counters.
+    """
+
+    def __init__(self):
+        self.spans    = {}   # (name, labels) → {'count', 'sum', 'max', 'recent'}
+        self.counters = {}   # (name, labels) → value
+        self._lock    = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self.spans.get(key)
+            if entry is None:
+                entry = self.spans[key] = {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                           'recent': deque(maxlen=METRICS_SAMPLES)}
+            entry['count'] += 1
+            entry['sum']   += seconds
+            entry['max']    = max(entry['max'], seconds)
+            entry['recent'].append(seconds)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self, name, **match):
+        """Merged count / sum / p50 / p95 of the `name` spans whose labels include `match`."""
+        with self._lock:
+            entries = [entry for (span, labels), entry in self.spans.items()
+                       if span == name and set(match.items()) <= set(labels)]
+            recent  = sorted(value for entry in entries for value in entry['recent'])
+            count   = sum(entry['count'] for entry in entries)
+            total   = sum(entry['sum'] for entry in entries)
+        if not recent:
+            return None
+        pick = lambda pct: recent[min(len(recent) - 1, int(len(recent) * pct / 100))]
+        return {'count': count, 'sum': total, 'p50': pick(50), 'p95': pick(95)}
+
+    def total(self, name, **match):
+        """Sum of the `name` counters whose labels include `match`."""
+        with self._lock:
+            return sum(value for (counter, labels), value in self.counters.items()
+                       if counter == name and set(match.items()) <= set(labels))
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def to_prometheus(self):
+        """Everything in the Prometheus text exposition format (spans as summaries)."""
+        def fmt(labels):
+            if not labels:
+                return ''
+            pairs = ','.join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in labels)
+            return '{' + pairs + '}'
+
+        lines = []
+        with self._lock:
+            spans    = {key: dict(entry, recent=sorted(entry['recent'])) for key, entry in self.spans.items()}
+            counters = dict(self.counters)
+        for span in sorted({name for name, _ in spans}):
+            metric = f"cryptochecker_{span}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (name, labels), entry in sorted(spans.items()):
+                if name != span:
+                    continue
+                recent = entry['recent']
+                for quantile in (0.5, 0.95, 0.99):
+                    value = recent[min(len(recent) - 1, int(len(recent) * quantile))]
+                    lines.append(f"{metric}{fmt(labels + (('quantile', quantile),))} {value:.6f}")
+                lines.append(f"{metric}_sum{fmt(labels)} {entry['sum']:.6f}")
+                lines.append(f"{metric}_count{fmt(labels)} {entry['count']}")
+        for counter in sorted({name for name, _ in counters}):
+            metric = f"cryptochecker_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == counter:
+                    lines.append(f"{metric}{fmt(labels)} {value}")
+        caches = {'history': historical_cache.stats(), 'coins': coins_cache.stats()}
+        for stat, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                           ('entries', 'gauge'), ('bytes', 'gauge')):
+            metric = f"cryptochecker_cache_{stat}" + ('_total' if kind == 'counter' else '')
+            lines.append(f"# TYPE {metric} {kind}")
+            for cache, stats in caches.items():
+                lines.append(f'{metric}{{cache="{cache}"}} {stats[stat]}')
+        return '\n'.join(lines) + '\n'
+
+    def overlay_lines(self):
+        """A few lines for the --stats overlay under the main screen."""
+        def ms(entry, key='p50'):
+            return f"{entry[key] * 1000:.0f}ms" if entry else "–"
+
+        calls = []
+        for op in ('coins_list', 'history', 'history_tail', 'network_fee'):
+            entry = self.summary('provider_call', op=op)
+            if entry:
+                calls.append(f"{op} {ms(entry)}/{ms(entry, 'p95')} ×{entry['count']}")
+        http = [f"{label} {ms(self.summary(name))}" for label, name in
+                (('wait', 'http_wait'), ('connect', 'http_connect'), ('request', 'http_request'),
+                 ('parse', 'parse'))]
+        backoff = self.summary('http_backoff')
+        if backoff:
+            http.append(f"backoff {backoff['sum']:.1f}s ×{backoff['count']}")
+
+        history = historical_cache.stats()
+        lookups = history['hits'] + history['misses']
+        hit_rate = f"{history['hits'] / lookups:.0%}" if lookups else "–"
+        sources = ' '.join(f"{source} {self.total('history_lookups', source=source)}"
+                           for source in ('disk', 'revalidate', 'tail', 'full', 'stale'))
+        frame, render = self.summary('frame'), self.summary('render')
+        render_bytes = self.total('render_bytes')
+        per_frame = f"{render_bytes / render['count'] / 1024:.1f}KB" if render else "–"
+
+        color = COLORS['cyan']
+        return [
+            f"{color}⏱ Calls  {' | '.join(calls) or 'none yet'} (p50/p95){COLORS['reset']}",
+            f"{color}⏱ HTTP   {' | '.join(http)} (p50){COLORS['reset']}",
+            f"{color}⏱ Cache  history {hit_rate} of {lookups} | {sources}{COLORS['reset']}",
+            f"{color}⏱ Render frame {ms(frame)} | diff+write {ms(render)} | {per_frame}/frame{COLORS['reset']}",
+        ]
+
+
+metrics = Metrics()
+
+
+def _timed_pool(pool_cls):
+    """Subclass of a urllib3 connection pool whose new connections are timed."""
+    class TimedConnection(pool_cls.ConnectionCls):
+        def _new_conn(self):
+            with metrics.span('http_tcp_connect', host=self.host):
+                return super()._new_conn()
+
+        def connect(self):
+            with metrics.span('http_connect', host=self.host):
+                return super().connect()
+
+    return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': TimedConnection})
+
+
+class TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that records http_connect / http_tcp_connect spans."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _timed_pool(pool_cls)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics → Metrics.to_prometheus()."""
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass   # the terminal belongs to the UI
+
+
+def write_metrics_file(path):
+    """Write the Prometheus text atomically (scrapers never see half a file)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(metrics.to_prometheus())
+    os.replace(tmp, path)
+
+
+def start_metrics_export(path=None, port=None):
+    """
+    Export metrics from daemon threads:
+      • path → rewrite it every METRICS_INTERVAL seconds (node_exporter’s
+        textfile collector picks it up).
+      • port → serve http://127.0.0.1:PORT/metrics.
+    """
+    if path:
+        def write_loop():
+            while True:
+                try:
+                    write_metrics_file(path)
+                except OSError:
+                    pass
+                time.sleep(METRICS_INTERVAL)
+        threading.Thread(target=write_loop, daemon=True).start()
+    if port:
+        server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def run_profiled(fn, session):
+    """
+    Run fn() under cProfile and dump the stats to PROFILE_FILE (session 2
+    onward get “.2”, “.3”… before the extension). Only the calling thread is
+    profiled; background fetches show up in the spans instead.
+    """
+    root, ext = os.path.splitext(PROFILE_FILE)
+    path = PROFILE_FILE if session == 1 else f"{root}.{session}{ext}"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+# ————————————————————————————————
+
+
+# ————— Terminal rendering —————
+ANSI_RE = re.compile(r'\033\[[0-9;?]*[A-Za-z]')
+
+
+def write_terminal(data):
+    """Write `data` to the terminal in as few syscalls as the OS allows (usually one)."""
+    sys.stdout.flush()
+    try:
+        fd = sys.stdout.fileno()
+        raw = data.encode(sys.stdout.encoding or 'utf-8', 'replace')
+        while raw:
+            raw = raw[os.write(fd, raw):]
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        sys.stdout.write(data)   # e.g. an IDE console without a real file descriptor
+        sys.stdout.flush()
+
+
+class TerminalRenderer:
+    """
+    Differential screen renderer. A frame is the complete text of a screen
+    (usually captured from print calls, see frame()). It is compared line by
+    line with the frame already on screen, and one write sends only the
+    changed lines, each addressed with an ANSI cursor move. Everything below
+    the frame (the prompt, typed input, messages) is cleared on every render.
+    A full redraw happens after reset() (someone else drew on the screen,
+    e.g. any_key() messages) or when the frame plus RENDER_PROMPT_ROWS for
+    the prompt and typed input doesn’t fit the terminal, since scrolling or
+    wrapped lines would shift the rows.
+    """
+
+    def __init__(self):
+        self._lines = None   # frame currently on screen; None = unknown
+
+    def reset(self):
+        self._lines = None
+
+    @contextmanager
+    def frame(self):
+        """Capture everything printed inside the block and render it as one frame."""
+        buffer = io.StringIO()
+        with metrics.span('frame'):
+            with redirect_stdout(buffer):
+                yield buffer
+            self.render(buffer.getvalue())
+
+    def render(self, text):
+        with metrics.span('render'):
+            self._render(text)
+
+    def _render(self, text):
+        lines = text.split('\n')
+        size  = shutil.get_terminal_size((80, 24))
+        fits  = len(lines) + RENDER_PROMPT_ROWS <= size.lines and all(
+            len(ANSI_RE.sub('', line)) < size.columns for line in lines)
+
+        if self._lines is None or not fits:
+            out = ['\033[H\033[2J', text]
+        else:
+            out = [f"\033[{row};1H{line}\033[K"
+                   for row, line in enumerate(lines, 1)
+                   if row > len(self._lines) or self._lines[row - 1] != line]
+            # Park the cursor where the full text would have left it and
+            # clear whatever is below (last prompt, typed input, messages)
+            out.append(f"\033[{len(lines)};{len(ANSI_RE.sub('', lines[-1])) + 1}H\033[J")
+        out = ''.join(out)
+        metrics.count('render_bytes', len(out))
+        write_terminal(out)
+        self._lines = lines if fits else None
+
+
+renderer = TerminalRenderer()
+# ————————————————————————————————
 
 
 def format_price(price: float) -> str:
@@ -167,292 +1137,2004 @@ def format_price(price: float) -> str:
     """
     return f"{price:,.2f}"
 
+# ————— HTTP transport —————
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+    acquire() blocks until a token is free; penalize() pauses the bucket, e.g.
+    when a provider answers 429 with a Retry-After.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate          = rate
+        self.burst         = burst
+        self.tokens        = burst
+        self.updated       = time.monotonic()
+        self.blocked_until = 0
+        self._lock         = threading.Lock()
 
-def get_coins_list():
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait_for)
+
+    def penalize(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def blocked_for(self):
+        """Seconds left of a penalize() pause (0 if none)."""
+        with self._lock:
+            return max(0.0, self.blocked_until - time.monotonic())
+
+
+class ProviderUnavailable(requests.RequestException):
     """
-    Fetch top 100 cryptocurrencies in the user’s selected currency.
-    1) Try primary API (CoinGecko or CoinCap).
-    2) If that fails, try the other.
-    3) If both fail but we have a cached coins_list, warn and return cached.
-    4) If no cache, print error and exit.
+    Raised by http_get when the provider’s circuit breaker is open, or when
+    it asked (Retry-After) not to be called for longer than HTTP_BACKOFF_MAX.
     """
-    global last_update, coins_list, active_api, coinlist_primary_api
 
-    user_currency = globals().get('user_currency', 'usd')
 
-    # If we have a cached list that is still “fresh,” return it
-    if time.time() - last_update < REFRESH_RATE and coins_list:
-        return coins_list
+_sessions       = {}
+_buckets        = {}
+_transport_lock = threading.Lock()
 
-    def try_coin_gecko():
-        """Attempt CoinGecko for top-100."""
-        try:
-            resp = requests.get(
-                "https://api.coingecko.com/api/v3/coins/markets",
-                params={
-                    'vs_currency': user_currency,
-                    'order':      'market_cap_desc',
-                    'per_page':   100,
-                    'page':       1,
-                    'sparkline':  'false'
-                },
-                timeout=10
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            result = []
-            for coin in data:
-                symbol           = coin['symbol'].upper()
-                name             = coin['name']
-                price            = coin['current_price']
-                emoji            = EMOJI_MAP.get(coin['id'], EMOJI_MAP.get(coin['symbol'], symbol))
-                price_change_24h = coin.get('price_change_percentage_24h', 0)
-                result.append({
-                    'id':               coin['id'],
-                    'name':             name,
-                    'symbol':           symbol,
-                    'price':            price,
-                    'emoji':            emoji,
-                    'price_change_24h': price_change_24h
-                })
-            return result
-        except Exception:
-            return []
 
-    def try_coincap():
-        """Attempt CoinCap for top-100."""
+def get_session(host):
+    """One pooled keep-alive requests.Session per host."""
+    with _transport_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+
+def get_bucket(provider):
+    """Rate limiter for a provider (see RATE_LIMITS)."""
+    with _transport_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            bucket = TokenBucket(*RATE_LIMITS.get(provider, RATE_LIMIT_DEFAULT))
+            _buckets[provider] = bucket
+        return bucket
+
+
+def retry_after_seconds(resp):
+    """Parse a Retry-After header (seconds or HTTP date); None if absent or invalid."""
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def http_get(url, params=None, provider=None, timeout=HTTP_TIMEOUT, retries=HTTP_MAX_RETRIES,
+             stream=False):
+    """
+    GET through the shared transport and return the successful Response
+    (with stream=True its body is left unread for the caller to stream).
+      • Reuses a pooled keep-alive session for the URL’s host.
+      • Waits for the provider’s token bucket before every attempt.
+      • Retries connection errors, timeouts, 429 and 5xx with exponential
+        backoff + full jitter. A Retry-After header pauses the whole provider
+        for its full length; the call waits it out if it is no longer than
+        HTTP_BACKOFF_MAX, otherwise it fails now (and so do further calls
+        until the pause is over) rather than retrying early.
+      • For a named provider, every attempt feeds its ProviderHealth, and
+        an open circuit breaker fails the call immediately (ProviderUnavailable).
+      • Rate-limit waits, attempts and backoff sleeps are timed (see Metrics).
+    Raises the last error once retries are exhausted (4xx other than 429
+    are raised immediately).
+    """
+    host    = urlparse(url).netloc
+    session = get_session(host)
+    bucket  = get_bucket(provider or host)
+    health  = provider_registry.get(provider) if provider else None
+    label   = provider or host
+
+    for attempt in range(retries + 1):
+        if health and health.is_open():
+            raise ProviderUnavailable(f"{provider} circuit breaker is open")
+        paused = bucket.blocked_for()
+        if paused > HTTP_BACKOFF_MAX:
+            raise ProviderUnavailable(f"{label} asked to retry in {paused:.0f}s")
+        with metrics.span('http_wait', provider=label):
+            bucket.acquire()
+        delay = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt))
+        delay = random.uniform(0, delay)
+        start = time.monotonic()
         try:
-            url   = "https://api.coincap.io/v2/assets"
-            resp  = requests.get(url, params={'limit': 100}, timeout=10)
-            resp.raise_for_status()
-            data  = resp.json().get('data', [])
-            result = []
-            for entry in data:
-                coin_id = entry.get('id', '')
-                symbol  = entry.get('symbol', '').upper()
-                name    = entry.get('name', symbol)
-                price   = float(entry.get('priceUsd', 0) or 0)
-                change  = float(entry.get('changePercent24Hr', 0) or 0)
-                emoji   = EMOJI_MAP.get(coin_id, EMOJI_MAP.get(symbol.lower(), symbol))
-                result.append({
-                    'id':               coin_id,
-                    'name':             name,
-                    'symbol':           symbol,
-                    'price':            price,
-                    'emoji':            emoji,
-                    'price_change_24h': change
-                })
-            return result
-        except Exception:
-            return []
+            with metrics.span('http_request', provider=label):
+                resp = session.get(url, params=params, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if health:
+                health.record(False, time.monotonic() - start)
+            if attempt == retries:
+                raise
+            metrics.count('http_retries', provider=label, reason=type(e).__name__)
+        else:
+            healthy = resp.status_code != 429 and resp.status_code < 500
+            if health:
+                health.record(healthy, time.monotonic() - start)
+            if healthy and resp.ok:
+                return resp
+            resp.close()
+            wait_for = None if healthy else retry_after_seconds(resp)
+            if wait_for is not None:
+                bucket.penalize(wait_for)   # honoured in full by every caller
+            if healthy or attempt == retries or (wait_for or 0) > HTTP_BACKOFF_MAX:
+                resp.raise_for_status()
+            metrics.count('http_retries', provider=label, reason=str(resp.status_code))
+            if wait_for is not None:
+                delay = wait_for
+        with metrics.span('http_backoff', provider=label):
+            time.sleep(delay)
+# ————————————————————————————————
+
+
+# ————— Streaming market_chart parser —————
+class PricesStreamParser:
+    """
+    Incremental parser for CoinGecko market_chart bodies
+    ({"prices": [[ts, price], ...], "market_caps": [...], "total_volumes": [...]}).
+    Bytes are fed as they arrive; [ts, price] pairs are matched with regexes
+    straight into array('q') / array('d'), and feed() reports completion as
+    soon as the "prices" array closes, so market_caps and total_volumes are
+    never read or parsed.
+    """
+
+    KEY_RE  = re.compile(rb'"prices"\s*:\s*\[')
+    PAIR_RE = re.compile(rb'\[\s*([^,\s]+)\s*,\s*([^\]\s]+)\s*\]')
+    END_RE  = re.compile(rb'\]\s*\]')    # last pair’s “]” + the prices array’s “]”
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.prices     = array('d')
+        self.buffer     = b''
+        self.in_prices  = False
+        self.seen_pair  = False
+        self.done       = False
+
+    def feed(self, chunk):
+        """Consume more bytes; returns True once the prices array is complete."""
+        if self.done:
+            return True
+        buf = self.buffer + chunk
+        pos = 0
+        if not self.in_prices:
+            match = self.KEY_RE.search(buf)
+            if not match:
+                self.buffer = buf[-32:]     # keep enough to catch a key split across chunks
+                return False
+            self.in_prices = True
+            pos = match.end()
+
+        if not self.seen_pair:
+            first = buf[pos:].lstrip()[:1]
+            if not first:
+                self.buffer = buf[pos:]
+                return False
+            if first == b']':                   # "prices": []
+                self.done = True
+                return True
+
+        # Parse every complete pair in the buffer in one findall; an
+        # incomplete trailing pair waits for the next chunk
+        end = self.END_RE.search(buf, pos)
+        limit = end.start() + 1 if end else buf.rfind(b']', pos) + 1
+        if limit > pos:
+            pairs = self.PAIR_RE.findall(buf, pos, limit)
+            self.timestamps.extend(int(float(ts)) for ts, price in pairs if price != b'null')
+            self.prices.extend(float(price) for _, price in pairs if price != b'null')
+            self.seen_pair = True
+            # Keep the last pair’s “]” so an array end split across chunks
+            # (“…]” | “]…”) is still recognised as “]]”
+            pos = limit - 1
+        if end:
+            self.done = True
+            self.buffer = b''
+            return True
+        self.buffer = buf[pos:]
+        return False
+
+    def series(self):
+        """The parsed PriceSeries; ValueError if the prices array never completed."""
+        if not self.done:
+            raise ValueError("truncated or unexpected market_chart body")
+        return PriceSeries(self.timestamps, self.prices)
+
+
+def stream_prices(resp):
+    """
+    Read a streamed market_chart Response into a PriceSeries. Reading stops as
+    soon as the prices array has been parsed; the rest of the body is dropped
+    along with its connection.
+    """
+    parser = PricesStreamParser()
+    try:
+        for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+            if parser.feed(chunk):
+                break
+    finally:
+        resp.close()
+    return parser.series()
+# ————————————————————————————————
+
+
+# ————— Hedged provider requests —————
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (≈ 25 ms … 1 min). Old samples fade out:
+    every HALF_LIFE recorded samples, all bucket counts are halved.
+    """
+
+    BOUNDS    = [0.025 * 1.5 ** i for i in range(20)]
+    HALF_LIFE = 200
+
+    def __init__(self):
+        self.counts  = [0.0] * (len(self.BOUNDS) + 1)
+        self.samples = 0
+        self._lock   = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+            self.samples += 1
+            if self.samples % self.HALF_LIFE == 0:
+                self.counts = [count / 2 for count in self.counts]
+
+    def percentile(self, pct):
+        """Upper bound (seconds) of the bucket holding the pct-th percentile; None if empty."""
+        with self._lock:
+            total = sum(self.counts)
+            if not total:
+                return None
+            running = 0.0
+            for idx, count in enumerate(self.counts):
+                running += count
+                if running >= total * pct / 100:
+                    return self.BOUNDS[min(idx, len(self.BOUNDS) - 1)]
+            return self.BOUNDS[-1]
+
+
+class ProviderHealth:
+    """
+    Health of one API provider: latency histogram + EWMA, a rolling window of
+    recent outcomes and a circuit breaker.
+      • closed    → requests flow; opens once the error rate reaches CIRCUIT_ERROR_RATE
+      • open      → skipped; after CIRCUIT_OPEN_SECONDS a background probe is sent
+      • half-open → probe in flight; success closes the breaker, failure reopens it
+    """
+
+    def __init__(self, name):
+        self.name      = name
+        self.histogram = LatencyHistogram()
+        self.ewma      = None
+        self.outcomes  = deque(maxlen=CIRCUIT_WINDOW)
+        self.state     = 'closed'
+        self.opened_at = 0
+        self._lock     = threading.Lock()
+
+    def record(self, success, elapsed):
+        """
+        Record one request. Only successes feed the latency histogram, so a
+        burst of fast 429s / 5xx doesn’t inflate the hedge budget; failures
+        count in the error rate (see rank_providers and the breaker).
+        """
+        if success:
+            self.histogram.record(elapsed)
+        with self._lock:
+            if success:
+                self.ewma = elapsed if self.ewma is None else (
+                    LATENCY_EWMA_ALPHA * elapsed + (1 - LATENCY_EWMA_ALPHA) * self.ewma)
+            self.outcomes.append(success)
+            if self.state == 'half-open':
+                self._set_state('closed' if success else 'open')
+            elif (self.state == 'closed' and len(self.outcomes) >= CIRCUIT_MIN_CALLS
+                    and self._error_rate() >= CIRCUIT_ERROR_RATE):
+                self._set_state('open')
+
+    def error_rate(self):
+        with self._lock:
+            return self._error_rate()
+
+    def allows_request(self):
+        return self.state == 'closed'
+
+    def is_open(self):
+        return self.state == 'open'
+
+    def due_for_probe(self):
+        """Move an open breaker whose cool-down has passed to half-open; True if so."""
+        with self._lock:
+            if self.state == 'open' and time.time() - self.opened_at >= CIRCUIT_OPEN_SECONDS:
+                self._set_state('half-open')
+                return True
+            return False
+
+    def _error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def _set_state(self, state):
+        self.state = state
+        if state == 'open':
+            self.opened_at = time.time()
+        elif state == 'closed':
+            self.outcomes.clear()
+
+
+class ProviderRegistry:
+    """
+    All known providers’ ProviderHealth, plus a daemon thread that probes
+    open breakers so a recovered provider rejoins without a user request
+    paying for the check.
+    """
+
+    def __init__(self):
+        self.providers = {}
+        self._lock     = threading.Lock()
+        self._prober   = None
+
+    def get(self, name):
+        with self._lock:
+            health = self.providers.get(name)
+            if health is None:
+                health = self.providers[name] = ProviderHealth(name)
+            return health
+
+    def start_probing(self):
+        with self._lock:
+            if self._prober and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_loop, daemon=True)
+            self._prober.start()
+
+    def status_line(self):
+        """“CoinGecko ● 180ms 0%err | CoinCap ○ open” for the header."""
+        parts = []
+        for name in sorted(self.providers):
+            health = self.providers[name]
+            if health.state == 'closed':
+                latency = f"{health.ewma * 1000:.0f}ms" if health.ewma is not None else "–"
+                parts.append(f"{COLORS['green']}{name} ● {latency} {health.error_rate():.0%}err")
+            elif health.state == 'half-open':
+                parts.append(f"{COLORS['yellow']}{name} ◐ probing")
+            else:
+                parts.append(f"{COLORS['red']}{name} ○ open")
+        return f"{COLORS['reset']} | ".join(parts) + COLORS['reset']
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(max(1, CIRCUIT_OPEN_SECONDS / 3))
+            for health in list(self.providers.values()):
+                if health.due_for_probe():
+                    # http_get records the outcome; make sure a probe that
+                    # never reached the network still reopens the breaker
+                    if not probe_provider(health.name) and health.state == 'half-open':
+                        health.record(False, 0)
+
+
+provider_registry = ProviderRegistry()
+_hedge_pool       = ThreadPoolExecutor(max_workers=8)
+
+
+def probe_provider(name):
+    """Cheap health-check request for a provider; True if it answered."""
+    urls = {
+        'CoinGecko': f"{COINGECKO_API_BASE}/ping",
+        'CoinCap':   f"{COINCAP_API_BASE}/assets?limit=1",
+    }
+    url = urls.get(name)
+    if not url:
+        return False
+    try:
+        http_get(url, provider=name, retries=0)
+        return True
+    except Exception:
+        return False
+
+
+def hedge_budget(provider):
+    """Seconds to wait on `provider` before racing the next one (p95 of successful calls)."""
+    histogram = provider_registry.get(provider).histogram
+    if histogram.samples < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_BUDGET
+    return histogram.percentile(HEDGE_PERCENTILE)
+
+
+def rank_providers(providers, preferred="Auto"):
+    """
+    Order providers for a request: a pinned `preferred` provider goes first,
+    the rest (or all, for "Auto") by expected cost, cheapest first: the hedge
+    budget plus the recent error rate × HTTP_TIMEOUT (what a failure
+    roughly costs). Providers whose circuit breaker is open are left out.
+    """
+    def expected_cost(name):
+        return hedge_budget(name) + provider_registry.get(name).error_rate() * HTTP_TIMEOUT
+
+    healthy = [name for name in providers if provider_registry.get(name).allows_request()]
+    ranked  = sorted(healthy, key=expected_cost)
+    if preferred in ranked:
+        ranked.remove(preferred)
+        ranked.insert(0, preferred)
+    return ranked
+
+
+def timed_fetch(op, provider, fetch):
+    """Run fetch() in a provider_call span; a falsy result counts as an error."""
+    with metrics.span('provider_call', op=op, provider=provider):
+        result = fetch()
+    if not result:
+        metrics.count('provider_call_errors', op=op, provider=provider)
+    return result
+
+
+def hedged_fetch(attempts, budget_scale=1, op='fetch'):
+    """
+    attempts: [(provider, fetch), ...] in preference order; each fetch returns
+    a result that is falsy on failure. Every attempt is timed as a
+    provider_call span labelled with `op` (see Metrics).
+      • Start the first attempt.
+      • If it hasn’t finished within its hedge budget (× budget_scale, for
+        fetches made of several requests), start the next one in parallel;
+        if it fails, start the next one immediately.
+      • The first truthy result wins; slower attempts finish in the background
+        and only feed the providers’ health stats (recorded in http_get).
+    Returns (provider, result), or (None, None) if every attempt failed
+    (or there was nothing to attempt).
+    """
+    provider_registry.start_probing()
+    if not attempts:
+        return None, None
+
+    pending  = {}
+    launched = 0
+
+    def launch():
+        nonlocal launched
+        provider, fetch = attempts[launched]
+        pending[_hedge_pool.submit(timed_fetch, op, provider, fetch)] = provider
+        launched += 1
+
+    launch()
+    while pending:
+        budget = None
+        if launched < len(attempts):
+            budget = hedge_budget(attempts[launched - 1][0]) * budget_scale
+        done, _ = wait(pending, timeout=budget, return_when=FIRST_COMPLETED)
+        if not done:
+            launch()   # primary is slow: race the next provider
+            continue
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            if result:
+                return provider, result
+        if not pending and launched < len(attempts):
+            launch()
+    return None, None
+# ————————————————————————————————
+
+
+# ————— Persistent on-disk cache —————
+_db_conn = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """Open the SQLite cache once. Returns None if the file can't be used."""
+    global _db_conn
+    if _db_conn is None:
+        try:
+            conn = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS historical ("
+                " coin_id TEXT, currency TEXT, days TEXT, ts REAL, ttl REAL, prices TEXT,"
+                " PRIMARY KEY (coin_id, currency, days))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS coins_list ("
+                " currency TEXT PRIMARY KEY, ts REAL, ttl REAL, coins TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fx_rates ("
+                " base TEXT PRIMARY KEY, ts REAL, rates TEXT)"
+            )
+            conn.commit()
+            _db_conn = conn
+        except Exception:
+            _db_conn = False
+    return _db_conn or None
+
+
+def disk_load_history(coin_id, currency, days):
+    """Return {'ts', 'ttl', 'prices'} for a stored series, or None."""
+    db = get_db()
+    if not db:
+        return None
+    try:
+        with _db_lock:
+            row = db.execute(
+                "SELECT ts, ttl, prices FROM historical WHERE coin_id=? AND currency=? AND days=?",
+                (coin_id, currency, str(days))
+            ).fetchone()
+        if row:
+            blob = row[2]
+            if isinstance(blob, bytes):
+                prices = PriceSeries.from_blob(blob)
+            else:   # rows written before series were stored as packed arrays
+                prices = PriceSeries.from_pairs(json.loads(blob))
+            return {'ts': row[0], 'ttl': row[1], 'prices': prices}
+    except Exception:
+        pass
+    return None
+
+
+def disk_save_history(coin_id, currency, days, prices):
+    """Store a series with its per-timeframe TTL (see HIST_CACHE_TTL)."""
+    db = get_db()
+    if not db or not prices:
+        return
+    try:
+        with _db_lock:
+            db.execute(
+                "INSERT OR REPLACE INTO historical VALUES (?, ?, ?, ?, ?, ?)",
+                (coin_id, currency, str(days), time.time(),
+                 HIST_CACHE_TTL.get(days, 60), sqlite3.Binary(prices.to_blob()))
+            )
+            db.commit()
+    except Exception:
+        pass
+
+
+def disk_load_coins(currency):
+    """Return {'ts', 'ttl', 'coins'} for the stored top-100 list, or None."""
+    db = get_db()
+    if not db:
+        return None
+    try:
+        with _db_lock:
+            row = db.execute(
+                "SELECT ts, ttl, coins FROM coins_list WHERE currency=?", (currency,)
+            ).fetchone()
+        if row:
+            return {'ts': row[0], 'ttl': row[1], 'coins': CoinTable.from_rows(json.loads(row[2]))}
+    except Exception:
+        pass
+    return None
+
+
+def disk_save_coins(currency, coins):
+    """Store the top-100 list so the next session can start warm."""
+    db = get_db()
+    if not db or not coins:
+        return
+    try:
+        with _db_lock:
+            db.execute(
+                "INSERT OR REPLACE INTO coins_list VALUES (?, ?, ?, ?)",
+                (currency, time.time(), DISK_COINS_TTL, json.dumps(coins.to_rows()))
+            )
+            db.commit()
+    except Exception:
+        pass
+
+
+def disk_load_fx():
+    """Return {'ts', 'rates'} for the stored FX table, or None."""
+    db = get_db()
+    if not db:
+        return None
+    try:
+        with _db_lock:
+            row = db.execute("SELECT ts, rates FROM fx_rates WHERE base=?", (BASE_CURRENCY,)).fetchone()
+        if row:
+            return {'ts': row[0], 'rates': json.loads(row[1])}
+    except Exception:
+        pass
+    return None
+
+
+def disk_save_fx(table):
+    db = get_db()
+    if not db or not table['rates']:
+        return
+    try:
+        with _db_lock:
+            db.execute("INSERT OR REPLACE INTO fx_rates VALUES (?, ?, ?)",
+                       (BASE_CURRENCY, table['ts'], json.dumps(table['rates'])))
+            db.commit()
+    except Exception:
+        pass
+# ————————————————————————————————
+
+
+# ————— Currency conversion —————
+def get_fx_rates(force=False):
+    """
+    One table of rates for every currency, as units per BASE_CURRENCY:
+      1) The in-memory table while younger than FX_RATES_TTL, then the disk copy.
+      2) Otherwise, hedge CoinGecko’s /exchange_rates (fiat and crypto, quoted
+         per BTC) against CoinCap’s /rates (USD per unit).
+      3) If both fail, keep whatever table we had, however old.
+    """
+    global fx_rates
+
+    if not force and time.time() - fx_rates['ts'] < FX_RATES_TTL:
+        return fx_rates
+    if not fx_rates['rates']:
+        stored = disk_load_fx()
+        if stored:
+            fx_rates = stored
+            if not force and time.time() - stored['ts'] < FX_RATES_TTL:
+                return fx_rates
+
+    def try_coin_gecko():
+        try:
+            resp  = http_get(f"{COINGECKO_API_BASE}/exchange_rates", provider='CoinGecko')
+            quote = resp.json().get('rates', {})
+            base  = float(quote[BASE_CURRENCY]['value'])
+            return {code: float(entry['value']) / base for code, entry in quote.items()
+                    if entry.get('value')}
+        except Exception:
+            return {}
+
+    def try_coincap():
+        if BASE_CURRENCY != 'usd':
+            return {}
+        try:
+            resp  = http_get(f"{COINCAP_API_BASE}/rates", provider='CoinCap')
+            rates = {}
+            for entry in resp.json().get('data', []):
+                rate_usd = float(entry.get('rateUsd') or 0)
+                if rate_usd and entry.get('symbol'):
+                    rates.setdefault(entry['symbol'].lower(), 1 / rate_usd)
+            return rates
+        except Exception:
+            return {}
+
+    fetchers = {'CoinGecko': try_coin_gecko, 'CoinCap': try_coincap}
+    _, rates = hedged_fetch([(name, fetchers[name]) for name in rank_providers(['CoinGecko', 'CoinCap'])],
+                            op='fx_rates')
+    if rates:
+        fx_rates = {'ts': time.time(), 'rates': rates}
+        disk_save_fx(fx_rates)
+    return fx_rates
+
+
+def currency_rate(currency=None):
+    """Units of `currency` (default: the user’s) per BASE_CURRENCY, or None if unknown."""
+    currency = (currency or globals().get('user_currency', BASE_CURRENCY)).lower()
+    if currency == BASE_CURRENCY:
+        return 1.0
+    return fx_rates['rates'].get(currency)
+
+
+def local_currency():
+    """The currency prices are shown in: the user’s, or BASE_CURRENCY until its rate is known."""
+    currency = globals().get('user_currency', BASE_CURRENCY)
+    return currency if currency_rate(currency) else BASE_CURRENCY
+
+
+def set_currency(currency):
+    """
+    Switch the display currency without touching the network: Coin views
+    convert on display, so only the FX table matters. It comes from memory or
+    the disk copy; if neither has the rate, the refresher fetches it (see
+    CoinListRefresher.fetch_fx) and prices switch over once it lands.
+    Returns False while no rate is known (prices stay in BASE_CURRENCY).
+    """
+    global fx_rates
+
+    globals()['user_currency'] = currency.lower()
+    if not fx_rates['rates']:
+        fx_rates = disk_load_fx() or fx_rates
+    if currency_rate() is None:
+        coins_refresher.fetch_fx()
+    return currency_rate() is not None
+# ————————————————————————————————
+
+
+# ————— Request coalescing —————
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the
+    function, the others wait for its result (or its exception) instead of
+    starting their own. Nothing is kept once the call has finished.
+      • do(key, fn, *args)    runs (or joins) the call and returns its result.
+      • start(key, fn, *args) the same in the background (REVALIDATE_WORKERS
+        threads); returns the Future at once, e.g. for stale-while-revalidate.
+    """
+
+    def __init__(self):
+        self._calls = {}   # key → Future of the call in flight
+        self._lock  = threading.Lock()
+
+    def do(self, key, fn, *args):
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn, args)
+        else:
+            metrics.count('coalesced_calls')
+        return future.result()
+
+    def start(self, key, fn, *args):
+        future, leader = self._join(key)
+        if leader:
+            _revalidate_pool.submit(self._run, key, future, fn, args)
+        return future
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _run(self, key, future, fn, args):
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_revalidate_pool = ThreadPoolExecutor(max_workers=REVALIDATE_WORKERS)
+fetch_flights    = SingleFlight()   # coin lists and historical series
+# ————————————————————————————————
+
+
+def get_coins_list(force=False, background=False):
+    """
+    Fetch top 100 cryptocurrencies (or the MARKET_UNIVERSE_PAGES universe) in
+    BASE_CURRENCY, as a CoinTable shown in the user’s currency (see CoinTable.rate).
+    force skips the fresh-cache check; background suppresses the console
+    warnings and never exits (used by CoinListRefresher).
+    1) Return the cached list while fresh. Once expired (and unless forced),
+       keep returning it for up to STALE_GRACE_FACTOR × REFRESH_RATE while
+       one background refresh runs (stale-while-revalidate).
+    2) Otherwise fetch (see fetch_coins_list); concurrent callers share one
+       download (SingleFlight).
+    3) If both APIs fail but we have a cached coins_list, warn and return cached.
+    4) If no cache, print error and exit.
+    """
+    # If we have a cached list that is still “fresh,” return it
+    key    = f"coins_{BASE_CURRENCY}"
+    cached = None if force else coins_cache.get(key)
+    if cached is not None:
+        return cached
+
+    age = time.time() - last_update
+    if (not force and STALE_WHILE_REVALIDATE and coins_list
+            and age < REFRESH_RATE * (1 + STALE_GRACE_FACTOR)):
+        fetch_flights.start(key, fetch_coins_list)
+        return coins_list
+
+    coins = fetch_flights.do(key, fetch_coins_list)
+    if last_refresh_failed and not background:
+        if coins:
+            print(f"{COLORS['yellow']}⚠️ Warning: Both CoinGecko and CoinCap failed. Using cached data.{COLORS['reset']}")
+        else:
+            print(f"{COLORS['red']}❌ Both CoinGecko and CoinCap failed and no cached data available. Exiting.{COLORS['reset']}")
+            sys.exit(1)
+    return coins
+
+
+def fetch_coins_list():
+    """
+    Download the coin list for get_coins_list and publish it:
+      1) Try the primary API (pinned by the user, or the faster one on “Auto”).
+      2) If that fails, or is slower than its usual latency, race the other.
+      3) If both fail, keep the current list (loaded from disk if there is
+         none yet) and set last_refresh_failed.
+    A universe download that lost a page mid-way never shrinks the list: the
+    prices it did get are merged into the current one (see keep_complete).
+    """
+    global last_update, coins_list, active_api, last_refresh_failed
+
+    universe = MARKET_UNIVERSE_PAGES > 0
+
+    def gecko_page(page):
+        """One /coins/markets page as a CoinTable (raises on failure)."""
+        resp = http_get(
+            f"{COINGECKO_API_BASE}/coins/markets",
+            provider='CoinGecko',
+            params={
+                'vs_currency': BASE_CURRENCY,
+                'order':      'market_cap_desc',
+                'per_page':   MARKET_PAGE_SIZE if universe else 100,
+                'page':       page,
+                'sparkline':  'false'
+            }
+        )
+        with metrics.span('parse', op='coins_list'):
+            data = resp.json()
+        table = CoinTable()
+        for coin in data:
+            symbol = coin['symbol'].upper()
+            emoji  = EMOJI_MAP.get(coin['id'], EMOJI_MAP.get(coin['symbol'], symbol))
+            table.append(coin['id'], coin['name'], symbol, emoji, coin.get('current_price'),
+                         coin.get('price_change_percentage_24h'), coin.get('market_cap'))
+        return table
+
+    def coincap_page(page):
+        """One /assets page as a CoinTable (raises on failure)."""
+        limit = COINCAP_PAGE_SIZE if universe else 100
+        resp  = http_get(
+            f"{COINCAP_API_BASE}/assets",
+            params={'limit': limit, 'offset': (page - 1) * limit},
+            provider='CoinCap'
+        )
+        with metrics.span('parse', op='coins_list'):
+            data = resp.json().get('data', [])
+        table = CoinTable()
+        for entry in data:
+            coin_id = entry.get('id', '')
+            symbol  = entry.get('symbol', '').upper()
+            emoji   = EMOJI_MAP.get(coin_id, EMOJI_MAP.get(symbol.lower(), symbol))
+            table.append(coin_id, entry.get('name', symbol), symbol, emoji, entry.get('priceUsd'),
+                         entry.get('changePercent24Hr'), entry.get('marketCapUsd'))
+        return table
+
+    def keep_complete(table, complete):
+        """
+        A page that failed mid-universe leaves a prefix; publishing it would
+        shrink the list (and send the user back to an earlier page). Merge
+        its prices into a copy of the current list instead, or fail if they
+        have nothing in common.
+        """
+        if complete or not isinstance(coins_list, CoinTable) or len(table) >= len(coins_list):
+            return table
+        merged = CoinTable()
+        merged.extend(coins_list)
+        quotes = {coin_id: (price, change) for coin_id, price, change
+                  in zip(table.ids, table.prices, table.changes)}
+        return merged if merged.update_quotes(quotes) else CoinTable()
+
+    def try_coin_gecko():
+        """Attempt CoinGecko for the top list (or the whole universe)."""
+        return keep_complete(*fetch_market_pages(gecko_page, max(1, MARKET_UNIVERSE_PAGES)))
+
+    def try_coincap():
+        """Attempt CoinCap for the top list (or the whole universe)."""
+        pages = 1
+        if universe:
+            wanted = MARKET_UNIVERSE_PAGES * MARKET_PAGE_SIZE
+            pages  = (wanted + COINCAP_PAGE_SIZE - 1) // COINCAP_PAGE_SIZE
+        return keep_complete(*fetch_market_pages(coincap_page, pages))
+
+    # Race the providers, fastest (or the user’s pinned choice) first
+    order = rank_providers(['CoinGecko', 'CoinCap'], coinlist_primary_api)
+    fetchers = {'CoinGecko': try_coin_gecko, 'CoinCap': try_coincap}
+    provider, new_list = hedged_fetch([(name, fetchers[name]) for name in order],
+                                      budget_scale=max(1, MARKET_UNIVERSE_PAGES), op='coins_list')
+    if new_list:
+        active_api = provider
+
+    if not new_list:
+        last_refresh_failed = True
+        if not coins_list:
+            stored = disk_load_coins(BASE_CURRENCY)
+            if stored:
+                coins_list  = stored['coins']
+                last_update = stored['ts']
+        return coins_list
+
+    if isinstance(coins_list, CoinTable) and coins_list.update_from(new_list):
+        # Same coins in the same order: prices were patched into the current
+        # table, so its Coin views, registry and search index stay valid
+        new_list = coins_list
+    else:
+        get_search_index(new_list)   # build the registry + search index off the UI thread
+    coins_list = new_list
+    last_update = time.time()
+    last_refresh_failed = False
+    coins_cache.put(f"coins_{BASE_CURRENCY}", coins_list)
+    disk_save_coins(BASE_CURRENCY, coins_list)
+    return coins_list
+
+
+def fetch_market_pages(fetch_page, pages):
+    """
+    Download pages 1..pages concurrently (each request still waits on the
+    provider’s rate limiter) and stream them into one CoinTable in page order
+    as they complete. Stops at the first empty or failed page, keeping the
+    prefix before it. Returns (table, complete): complete is False if a page
+    failed (the table is then a truncated prefix, empty if page 1 failed).
+    """
+    table    = CoinTable()
+    complete = True
+    with ThreadPoolExecutor(max_workers=min(pages, MARKET_FETCH_WORKERS)) as pool:
+        futures = [pool.submit(fetch_page, page) for page in range(1, pages + 1)]
+        for future in futures:
+            try:
+                page_table = future.result()
+            except Exception:
+                page_table, complete = None, False
+            if not page_table:
+                for pending in futures:
+                    pending.cancel()
+                break
+            table.extend(page_table)
+    return table, complete
+
+
+def fetch_quotes(ids, provider=None):
+    """
+    Batched price quotes for `ids`: CoinGecko’s /simple/price (or CoinCap’s
+    /assets?ids= when the list came from CoinCap, whose ids differ) with up to
+    QUOTE_BATCH_SIZE ids per request, the chunks fetched concurrently.
+    Returns {id: (price, change_24h)}; failed chunks are simply missing.
+    """
+    ids = list(dict.fromkeys(coin_id for coin_id in ids if coin_id))
+    if not ids:
+        return {}
+    provider = provider or active_api or 'CoinGecko'
+    currency = BASE_CURRENCY
+
+    def gecko_chunk(chunk):
+        resp = http_get(
+            f"{COINGECKO_API_BASE}/simple/price",
+            params={'ids': ','.join(chunk), 'vs_currencies': currency,
+                    'include_24hr_change': 'true'},
+            provider='CoinGecko'
+        )
+        quotes = {}
+        for coin_id, entry in resp.json().items():
+            price = entry.get(currency)
+            if price is not None:
+                quotes[coin_id] = (float(price), entry.get(f"{currency}_24h_change"))
+        return quotes
+
+    def coincap_chunk(chunk):
+        resp = http_get(f"{COINCAP_API_BASE}/assets", params={'ids': ','.join(chunk)}, provider='CoinCap')
+        quotes = {}
+        for entry in resp.json().get('data', []):
+            if entry.get('priceUsd') is not None:
+                change = entry.get('changePercent24Hr')
+                quotes[entry.get('id')] = (float(entry['priceUsd']),
+                                           float(change) if change is not None else None)
+        return quotes
+
+    fetch_chunk = coincap_chunk if provider == 'CoinCap' else gecko_chunk
+    chunks = [ids[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(ids), QUOTE_BATCH_SIZE)]
+    quotes = {}
+    with ThreadPoolExecutor(max_workers=min(len(chunks), MARKET_FETCH_WORKERS)) as pool:
+        for future in [pool.submit(fetch_chunk, chunk) for chunk in chunks]:
+            try:
+                quotes.update(future.result())
+            except Exception:
+                pass
+    return quotes
+
+
+def refresh_quotes(table, ids):
+    """Fetch batched quotes for `ids` and merge them into `table` in place."""
+    quotes = fetch_quotes(ids)
+    return table.update_quotes(quotes) if quotes and table else 0
+
+
+def load_cached_coins():
+    """
+    Warm start: load the last saved top-100 list from disk into coins_list.
+    Returns True if a stored list was found (even if it is past its TTL).
+    """
+    global coins_list, last_update
+
+    stored = disk_load_coins(BASE_CURRENCY)
+    if not stored:
+        return False
+    coins_list  = stored['coins']
+    last_update = stored['ts']
+    return True
+
+
+class CoinListRefresher:
+    """
+    Daemon thread that keeps coins_list fresh. It fetches the next top list
+    REFRESH_LEAD_TIME seconds before the current one expires and publishes it
+    either by patching the current CoinTable’s price columns in place (same
+    coins, same order) or by rebinding coins_list to the new table (one
+    atomic assignment), so the foreground never waits on I/O.
+
+    Between full refreshes, the coins on screen (see watch()) and the
+    WATCHLIST get batched quotes every QUOTE_REFRESH_RATE seconds. The FX
+    table is refreshed after each full refresh, or on demand when the user
+    picks a currency we have no rate for (fetch_fx()).
+    """
+
+    def __init__(self):
+        self._thread    = None
+        self._wake      = threading.Event()
+        self._forced    = False
+        self._fx_wanted = False
+        self._watched   = []
+        self._quoted_at = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def refresh_now(self):
+        """Ask for an immediate refresh (e.g. after switching API)."""
+        self._forced = True
+        self._wake.set()
+
+    def fetch_fx(self):
+        """Ask for the FX table now (e.g. the user’s currency has no rate yet)."""
+        self._fx_wanted = True
+        self._wake.set()
+
+    def watch(self, ids):
+        """Set the coin ids currently on screen (replaces the previous set)."""
+        self._watched = list(ids)
+
+    def _run(self):
+        while True:
+            due = last_update + REFRESH_RATE - REFRESH_LEAD_TIME
+            quotes_due = self._quoted_at + QUOTE_REFRESH_RATE
+            self._wake.wait(timeout=max(0, min(due, quotes_due) - time.time()))
+            self._wake.clear()
+
+            if self._fx_wanted:
+                # Coin views convert on display, so prices switch over as
+                # soon as the table has the rate
+                self._fx_wanted = False
+                get_fx_rates(force=currency_rate() is None)
+            forced, self._forced = self._forced, False
+
+            if not forced and time.time() < due:
+                # Only the quotes are due: refresh the watched rows in place
+                # (unless the live feed is already pushing prices)
+                if time.time() >= quotes_due:
+                    if not live_feed.connected:
+                        refresh_quotes(coins_list, WATCHLIST + self._watched)
+                    self._quoted_at = time.time()
+                continue
+
+            previous = last_update
+            get_coins_list(force=True, background=True)
+            get_fx_rates()
+            self._quoted_at = time.time()
+            if last_update == previous:
+                # Both APIs failed: keep the old snapshot, retry a bit later
+                self._wake.wait(timeout=REFRESH_RETRY_DELAY)
+
+
+coins_refresher = CoinListRefresher()
+
+
+# ————— Live prices (WebSocket) —————
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def ws_accept_key(key):
+    """Sec-WebSocket-Accept value for a client’s Sec-WebSocket-Key."""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def ws_frame(opcode, payload=b'', mask=True):
+    """One final WebSocket frame; clients must mask, servers must not."""
+    head   = bytearray([0x80 | opcode])
+    length = len(payload)
+    bit    = 0x80 if mask else 0
+    if length < 126:
+        head.append(bit | length)
+    elif length < 1 << 16:
+        head.append(bit | 126)
+        head += struct.pack('!H', length)
+    else:
+        head.append(bit | 127)
+        head += struct.pack('!Q', length)
+    if mask:
+        key = os.urandom(4)
+        head += key
+        payload = bytes(byte ^ key[i % 4] for i, byte in enumerate(payload))
+    return bytes(head) + payload
+
+
+def ws_read_frame(rfile):
+    """Read one frame from a buffered socket file → (fin, opcode, payload)."""
+    def read_exact(count):
+        data = rfile.read(count)
+        if len(data) < count:
+            raise ConnectionError('WebSocket connection closed')
+        return data
+
+    first, second = read_exact(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', read_exact(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', read_exact(8))[0]
+    key     = read_exact(4) if second & 0x80 else None
+    payload = read_exact(length)
+    if key:
+        payload = bytes(byte ^ key[i % 4] for i, byte in enumerate(payload))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+class WebSocketClient:
+    """
+    Minimal RFC 6455 client (stdlib only) for text streams such as CoinCap’s
+    price feed: ws:// or wss:// handshake, fragmented messages, ping → pong
+    and close. A socket timeout surfaces as an exception from recv().
+    """
+
+    def __init__(self, url, timeout=HTTP_TIMEOUT):
+        self.url     = url
+        self.timeout = timeout
+        self.sock    = None
+        self._rfile  = None
+
+    def connect(self):
+        parts  = urlparse(self.url)
+        secure = parts.scheme == 'wss'
+        sock   = socket.create_connection((parts.hostname, parts.port or (443 if secure else 80)),
+                                          timeout=self.timeout)
+        try:
+            if secure:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+            key  = base64.b64encode(os.urandom(16)).decode()
+            path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+            sock.sendall((
+                f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+            ).encode())
+            rfile   = sock.makefile('rb')
+            status  = rfile.readline().decode('latin-1')
+            headers = {}
+            while True:
+                line = rfile.readline().decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if status.split()[1:2] != ['101'] or headers.get('sec-websocket-accept') != ws_accept_key(key):
+                raise ConnectionError(f"WebSocket handshake failed: {status.strip()}")
+        except Exception:
+            sock.close()
+            raise
+        self.sock, self._rfile = sock, rfile
+
+    def recv(self):
+        """Next text message, or None once the server closes the connection."""
+        message = bytearray()
+        while True:
+            fin, opcode, payload = ws_read_frame(self._rfile)
+            if opcode == 0x9:     # ping
+                self.sock.sendall(ws_frame(0xA, payload))
+            elif opcode == 0x8:   # close: echo it and stop
+                try:
+                    self.sock.sendall(ws_frame(0x8, payload[:2]))
+                except OSError:
+                    pass
+                return None
+            elif opcode != 0xA:   # text / binary / continuation (pongs are ignored)
+                message += payload
+                if fin:
+                    return message.decode('utf-8')
+
+    def close(self):
+        if self.sock is None:
+            return
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def replay_messages(path, loop=True):
+    """
+    Yield (delay, message) from a replay file, one JSON object per line:
+      • {"at": seconds, "data": {id: price, ...}} – sent `at` seconds after
+        the start (the format LIVE_RECORD_FILE writes);
+      • {id: price, ...} – a bare message, sent LIVE_REPLAY_INTERVAL after
+        the previous one.
+    With loop=True the file starts over when it ends.
+    """
+    while True:
+        clock = 0.0
+        sent  = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if 'data' in entry and 'at' in entry:
+                    at, message = float(entry['at']), entry['data']
+                else:
+                    at, message = clock + LIVE_REPLAY_INTERVAL, entry
+                yield max(0.0, at - clock), message
+                clock = max(clock, at)
+                sent += 1
+        if not loop or not sent:
+            return
+
+
+class ReplayHandler(socketserver.StreamRequestHandler):
+    """Accept a WebSocket upgrade and stream the replay file, filtered by ?assets=."""
+
+    def handle(self):
+        request = self.rfile.readline().decode('latin-1').split()
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if len(request) < 2 or not key:
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {ws_accept_key(key)}\r\n\r\n"
+        ).encode())
+
+        wanted = parse_qs(urlparse(request[1]).query).get('assets', ['ALL'])[0]
+        assets = None if wanted.upper() == 'ALL' else set(wanted.split(','))
+        try:
+            for delay, message in replay_messages(self.server.path, self.server.loop):
+                time.sleep(delay / self.server.speed)
+                if assets is not None:
+                    message = {coin_id: price for coin_id, price in message.items() if coin_id in assets}
+                    if not message:
+                        continue
+                self.wfile.write(ws_frame(0x1, json.dumps(message).encode(), mask=False))
+            self.wfile.write(ws_frame(0x8, struct.pack('!H', 1000), mask=False))
+        except OSError:
+            pass   # client went away
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for CoinCap’s price stream: every client gets the replay
+    file (see replay_messages) from the start, `speed` times faster than
+    recorded. Use ws://127.0.0.1:<port>/prices as LIVE_PRICES_URL.
+    """
+
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self, path, host='127.0.0.1', port=LIVE_REPLAY_PORT, speed=1.0, loop=True):
+        super().__init__((host, port), ReplayHandler)
+        self.path  = path
+        self.speed = speed
+        self.loop  = loop
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/prices"
+
+
+def serve_replay(path, port=LIVE_REPLAY_PORT):
+    """Run a ReplayServer in the foreground (python CryptoChecker.py --replay FILE [PORT])."""
+    with ReplayServer(path, port=port) as server:
+        print(f"{COLORS['green']}Replaying {path} on {server.url} (Ctrl+C to stop){COLORS['reset']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class LivePriceFeed:
+    """
+    Push alternative to quote polling: a daemon thread subscribed to
+    LIVE_PRICES_URL for the top LIVE_MAX_ASSETS coins (plus WATCHLIST) that
+    applies each tick to coins_list in place (CoinTable.update_quotes) and
+    remembers which ids changed, so a view can redraw just those rows.
+      • The stream speaks CoinCap ids; a list from CoinGecko is mapped
+        first (see map_ids) and ticks are translated back.
+      • Reconnects with exponential backoff, and resubscribes when the
+        refresher rebinds coins_list to a table with other coins.
+      • While connected, CoinListRefresher skips its quote polling.
+    """
+
+    def __init__(self, url=None):
+        self.url        = url
+        self.connected  = False
+        self.ticks      = 0
+        self.updated    = threading.Event()
+        self._changed   = set()
+        self._lock      = threading.Lock()
+        self._thread    = None
+        self._client    = None
+        self._stop      = threading.Event()
+        self._started   = 0.0
+        self.ids        = None   # table id → CoinCap id of the current subscription
+        self._table_ids = {}     # CoinCap id → [table ids]
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._client:
+            self._client.close()
+
+    def take_changed(self):
+        """Ids whose price changed since the last call (and reset the set)."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            self.updated.clear()
+        return changed
+
+    def map_ids(self, table):
+        """
+        {table id: CoinCap id} for the top LIVE_MAX_ASSETS coins plus WATCHLIST.
+        A list from CoinCap maps to itself. CoinGecko ids often differ
+        (binancecoin / binance-coin, ripple / xrp, …), so they are matched
+        against CoinCap’s asset list: the same id if its symbol agrees, else
+        the symbol (the biggest market cap wins, as in CoinRegistry). Coins
+        without a match are left out. If CoinCap can’t be reached, ids are
+        used as-is and only the ones that happen to agree will tick.
+        """
+        ids = list(dict.fromkeys(WATCHLIST + (table.ids[:LIVE_MAX_ASSETS] if table else [])))
+        if active_api == 'CoinCap':
+            return {coin_id: coin_id for coin_id in ids}
+        try:
+            resp   = http_get(f"{COINCAP_API_BASE}/assets", params={'limit': COINCAP_PAGE_SIZE},
+                              provider='CoinCap', retries=0)
+            assets = resp.json().get('data', [])
+        except Exception:
+            return {coin_id: coin_id for coin_id in ids}
+
+        symbol_of, by_symbol = {}, {}
+        for entry in assets:   # ranked by market cap
+            symbol = (entry.get('symbol') or '').lower()
+            symbol_of[entry.get('id')] = symbol
+            by_symbol.setdefault(symbol, entry.get('id'))
+        symbols = dict(zip(table.ids, table.symbols)) if table else {}
+        mapping = {}
+        for coin_id in ids:
+            symbol = symbols.get(coin_id, '').lower()
+            if coin_id in symbol_of and symbol_of[coin_id] in (symbol, ''):
+                mapping[coin_id] = coin_id
+            elif symbol in by_symbol:
+                mapping[coin_id] = by_symbol[symbol]
+        return mapping
+
+    def subscribe(self, table):
+        """Map `table`’s ids to CoinCap ids and return the subscription URL."""
+        self.ids = self.map_ids(table)
+        table_ids = {}
+        for coin_id, coincap_id in self.ids.items():
+            table_ids.setdefault(coincap_id, []).append(coin_id)
+        self._table_ids = table_ids
+        return self.subscription_url(table)
+
+    def subscription_url(self, table):
+        if self.ids is not None:
+            ids = list(dict.fromkeys(self.ids.values()))
+        else:
+            ids = list(dict.fromkeys(WATCHLIST + table.ids[:LIVE_MAX_ASSETS])) if table else WATCHLIST
+        return f"{self.url or LIVE_PRICES_URL}?assets={','.join(ids) or 'ALL'}"
+
+    def apply(self, message, table):
+        """Apply one {CoinCap id: "price"} tick message to `table`; returns the rows updated."""
+        if not table:
+            return 0
+        quotes = {}
+        for coincap_id, price in message.items():
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                continue
+            for coin_id in self._table_ids.get(coincap_id, [coincap_id]):
+                quotes[coin_id] = (price, None)
+        if not table.update_quotes(quotes):
+            return 0
+        with self._lock:
+            self._changed.update(quotes)
+            self.updated.set()
+        self.ticks += 1
+        return len(quotes)
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            table  = coins_list
+            client = WebSocketClient(self.subscribe(table), timeout=LIVE_IDLE_TIMEOUT)
+            try:
+                client.connect()
+                self._client, self.connected, failures = client, True, 0
+                self._started = time.time()
+                while not self._stop.is_set() and coins_list is table:
+                    text = client.recv()
+                    if text is None:
+                        break
+                    message = json.loads(text)
+                    self.apply(message, table)
+                    if LIVE_RECORD_FILE:
+                        self._record(message)
+            except Exception:
+                failures += 1
+            finally:
+                self.connected = False
+                client.close()
+            if coins_list is not table:
+                continue   # new coins: resubscribe right away
+            self._stop.wait(min(LIVE_RECONNECT_MAX, 2 ** failures))
+
+    def _record(self, message):
+        try:
+            with open(LIVE_RECORD_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'at': round(time.time() - self._started, 3), 'data': message}) + '\n')
+        except OSError:
+            pass
+
+
+live_feed = LivePriceFeed()
+
+
+def wait_for_enter(timeout):
+    """True if a keypress / line is waiting on stdin (waits up to `timeout` seconds)."""
+    if os.name == 'nt':
+        import msvcrt
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if msvcrt.kbhit():
+                return True
+            time.sleep(0.05)
+        return False
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    return bool(ready)
+
+
+def live_view(page, coins):
+    """
+    L in the main menu: show the current page and redraw it as ticks arrive
+    from live_feed, a changed price in green if it went up, red if down.
+    The renderer rewrites only the lines that changed. Enter returns.
+    """
+    live_feed.start()
+
+    start_idx  = page * COINS_PER_PAGE
+    page_coins = coins[start_idx:start_idx + COINS_PER_PAGE]
+    table      = coins_list
+    shown      = {coin['id']: (coin['price'], '') for coin in page_coins}   # id → (price, highlight)
+    renderer.reset()
+    while True:
+        changed = live_feed.take_changed()
+        for coin in page_coins:
+            price, _ = shown[coin['id']]
+            if coin['id'] in changed and coin['price'] != price:
+                shown[coin['id']] = (coin['price'], COLORS['green'] if coin['price'] > price else COLORS['red'])
+
+        state = (f"{COLORS['green']}● connected{COLORS['reset']}" if live_feed.connected
+                 else f"{COLORS['red']}○ connecting…{COLORS['reset']}")
+        subscribed = live_feed.ids
+        missing = [coin['symbol'] for coin in page_coins
+                   if subscribed is not None and coin['id'] not in subscribed]
+        with renderer.frame():
+            print(f"\n{COLORS['yellow']}📡 LIVE PRICES (CoinCap stream){COLORS['reset']}")
+            print(f"{state}  {live_feed.ticks} ticks")
+            if missing:
+                print(f"{COLORS['yellow']}⚠️ Not on CoinCap’s stream: {', '.join(missing)}{COLORS['reset']}")
+            print(f"{COLORS['green']}┌{'─' * 40}┐{COLORS['reset']}")
+            for i, coin in enumerate(page_coins):
+                print(format_coin_row(start_idx + i + 1, coin, shown[coin['id']][1]))
+            print(f"{COLORS['green']}└{'─' * 40}┘{COLORS['reset']}")
+            print(f"\n{COLORS['cyan']}Press Enter to return{COLORS['reset']}")
+
+        if coins_list is not table:
+            return   # the refresher swapped in other coins: back to the list
+        if wait_for_enter(0.2):
+            sys.stdin.readline()
+            return
+# ————————————————————————————————
+
+
+def animated_loading():
+    """Simple “loading” animation."""
+    for i in range(10):
+        time.sleep(0.1)
+        sys.stdout.write('\r[' + '■' * i + ' ' * (10 - i) + ']')
+        sys.stdout.flush()
+    print()
+
+
+def display_coins_page(page, coins):
+    """Display a page of coins (paginated). Only the visible rows are read and formatted."""
+    start_idx  = page * COINS_PER_PAGE
+    end_idx    = start_idx + COINS_PER_PAGE
+    page_coins = coins[start_idx:end_idx]
+    total_pages = (len(coins) + COINS_PER_PAGE - 1) // COINS_PER_PAGE
+
+    print(f"\n{COLORS['yellow']}📖 Page {page+1}/{total_pages}{COLORS['reset']}")
+    print(f"{COLORS['green']}┌{'─' * 40}┐{COLORS['reset']}")
+
+    for i, coin in enumerate(page_coins):
+        print(format_coin_row(start_idx + i + 1, coin))
+
+    print(f"{COLORS['green']}└{'─' * 40}┘{COLORS['reset']}")
+    print(f"\n{COLORS['cyan']}N: Next Page  P: Prev Page  S: Search  L: Live  Q: Quit{COLORS['reset']}")
+
+
+def format_coin_row(num, coin, price_color=''):
+    """One line of the coin list; price_color highlights the price (live updates)."""
+    trend_color  = COLORS['green'] if coin['price_change_24h'] >= 0 else COLORS['red']
+    trend_symbol = '▲' if coin['price_change_24h'] >= 0 else '▼'
+    price_display = f"{format_price(coin['price']):>12}"
+    if price_color:
+        price_display = f"{price_color}{price_display}{COLORS['reset']}"
+    return f"{num:2}. {coin['emoji']} {coin['name'][:20]:<20} {price_display} {trend_color}{trend_symbol}{COLORS['reset']}"
+
+
+class CoinRegistry:
+    """
+    Constant-time coin lookup for one coin-list snapshot: id, symbol
+    (case-insensitive) and COIN_ALIASES all map to a row number. An ambiguous
+    symbol resolves to the coin with the biggest market cap. Exchange pairs
+    are pre-grouped by their base coin’s id.
+    """
+
+    def __init__(self, coins):
+        self.coins     = coins
+        self.by_id     = {}
+        self.by_symbol = {}
+        self.pairs_by_base = {}
+
+        for idx in range(len(coins)):
+            self.by_id.setdefault(coins.ids[idx], idx)
+            self.by_symbol.setdefault(coins.symbols[idx].lower(), []).append(idx)
+
+        for pair_key in EXCHANGE_PAIRS:
+            base_key, quote_key = pair_key.split('_')
+            base_idx, quote_idx = self.resolve(base_key), self.resolve(quote_key)
+            if base_idx is not None and quote_idx is not None:
+                self.pairs_by_base.setdefault(coins.ids[base_idx], []).append((pair_key, quote_idx))
+
+    def resolve(self, key):
+        """Row number for an id, symbol or alias; None if unknown."""
+        key = key.strip().lower()
+        if key in self.by_id:
+            return self.by_id[key]
+        if key in self.by_symbol:
+            return self.by_symbol[key][0]
+        alias = COIN_ALIASES.get(key)
+        return self.by_id.get(alias) if alias else None
+
+    def get(self, key):
+        """Coin dict for an id, symbol or alias; None if unknown."""
+        idx = self.resolve(key)
+        return None if idx is None else self.coins.row(idx)
+
+    def pairs_for(self, coin_id):
+        """[(pair_key, base_coin, quote_coin), ...] for EXCHANGE_PAIRS based on this coin."""
+        base_idx = self.by_id.get(coin_id)
+        if base_idx is None:
+            return []
+        base_coin = self.coins.row(base_idx)
+        return [(pair_key, base_coin, self.coins.row(quote_idx))
+                for pair_key, quote_idx in self.pairs_by_base.get(coin_id, ())]
+
+
+_coin_registry = None
+
+
+def get_coin_registry(coins):
+    """CoinRegistry for this exact coins snapshot, rebuilt only when the snapshot changes."""
+    global _coin_registry
+
+    if not isinstance(coins, CoinTable):
+        coins = CoinTable.from_rows(coins)
+    registry = _coin_registry
+    if registry is None or registry.coins is not coins:
+        registry = CoinRegistry(coins)
+        _coin_registry = registry
+    return registry
+
+
+class SearchIndex:
+    """
+    Search structures built once per coin-list snapshot (row numbers into a
+    CoinTable, which is ordered by market cap):
+      • exact maps      symbol / id / alias (from the CoinRegistry), name → rows
+      • prefix trie     over symbols, ids, names and name words; each node
+                        keeps its TRIE_NODE_CAP biggest coins
+      • trigram index   over ids and names, for substring and typo-tolerant hits
+    search() ranks by match quality, then market cap.
+    """
+
+    TRIE_NODE_CAP  = 32
+    FUZZY_MIN_SIM  = 0.35
+
+    # Match-quality scores (higher wins)
+    EXACT_SYMBOL, EXACT_ID, EXACT_NAME, PREFIX, SUBSTRING, FUZZY = 100, 90, 85, 60, 45, 0
+
+    def __init__(self, coins):
+        self.coins     = coins
+        self.registry  = get_coin_registry(coins)
+        self.by_name   = {}
+        self.trie      = ({}, [])          # node = (children, row numbers)
+        self.trigrams  = {}
+        self.gram_counts = array('H')      # distinct trigrams per row, for similarity
+
+        for idx in range(len(coins)):
+            symbol = coins.symbols[idx].lower()
+            name   = coins.names[idx].lower()
+            coin_id = coins.ids[idx]
+            self.by_name.setdefault(name, []).append(idx)
+            for key in {symbol, coin_id, name, *name.split()}:
+                self._trie_insert(key, idx)
+            grams = self._grams(coin_id) | self._grams(name)
+            self.gram_counts.append(min(len(grams), 65535))
+            for gram in grams:
+                self.trigrams.setdefault(gram, []).append(idx)
+
+    @staticmethod
+    def _grams(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def _trie_insert(self, key, idx):
+        node = self.trie
+        for char in key:
+            child = node[0].get(char)
+            if child is None:
+                child = node[0][char] = ({}, [idx])
+            elif len(child[1]) < self.TRIE_NODE_CAP and child[1][-1] != idx:
+                child[1].append(idx)
+            node = child
+
+    def _trie_prefix(self, prefix):
+        node = self.trie
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return node[1]
 
-    # Attempt primary first, then fallback
-    new_list = []
-    if coinlist_primary_api == "CoinGecko":
-        new_list = try_coin_gecko()
-        if new_list:
-            active_api = "CoinGecko"
-        else:
-            new_list = try_coincap()
-            if new_list:
-                active_api = "CoinCap"
-    else:  # primary is CoinCap
-        new_list = try_coincap()
-        if new_list:
-            active_api = "CoinCap"
-        else:
-            new_list = try_coin_gecko()
-            if new_list:
-                active_api = "CoinGecko"
+    def search(self, query, limit=COINS_PER_PAGE):
+        """Best `limit` row numbers for `query`, best match first."""
+        query = query.strip().lower()
+        if not query:
+            return []
+        scores = {}
 
-    if not new_list:
-        if coins_list:
-            print(f"{COLORS['yellow']}⚠️ Warning: Both CoinGecko and CoinCap failed. Using cached data.{COLORS['reset']}")
-            return coins_list
-        else:
-            print(f"{COLORS['red']}❌ Both CoinGecko and CoinCap failed and no cached data available. Exiting.{COLORS['reset']}")
-            sys.exit(1)
+        def hit(idx, score):
+            if score > scores.get(idx, -1):
+                scores[idx] = score
 
-    coins_list = new_list
-    last_update = time.time()
-    return coins_list
+        for idx in self.registry.by_symbol.get(query, ()):
+            hit(idx, self.EXACT_SYMBOL)
+        exact = self.registry.resolve(query)
+        if exact is not None:
+            hit(exact, self.EXACT_ID)
+        for idx in self.by_name.get(query, ()):
+            hit(idx, self.EXACT_NAME)
+        for idx in self._trie_prefix(query):
+            hit(idx, self.PREFIX)
 
+        # Substring / fuzzy matching only when the cheap lookups left room:
+        # count shared trigrams per row (in C, via Counter) and verify only
+        # the best-sharing candidates
+        if len(scores) < limit and len(query) >= 3:
+            query_grams = self._grams(query)
+            inner_grams = sum(1 for gram in query_grams if ' ' not in gram)
+            counts = Counter()
+            for gram in query_grams:
+                counts.update(self.trigrams.get(gram, ()))
+            for idx, shared in counts.most_common(limit * 8):
+                if idx in scores:
+                    continue
+                if shared >= inner_grams and (query in self.coins.names[idx].lower()
+                                              or query in self.coins.ids[idx]):
+                    hit(idx, self.SUBSTRING)
+                    continue
+                similarity = shared / (len(query_grams) + self.gram_counts[idx] - shared)
+                if similarity >= self.FUZZY_MIN_SIM:
+                    hit(idx, self.FUZZY + similarity * 40)
 
-def animated_loading():
-    """Simple “loading” animation."""
-    for i in range(10):
-        time.sleep(0.1)
-        sys.stdout.write('\r[' + '■' * i + ' ' * (10 - i) + ']')
-        sys.stdout.flush()
-    print()
+        market_caps = self.coins.market_caps
+        ranked = sorted(scores, key=lambda idx: (-scores[idx], -market_caps[idx], idx))
+        return ranked[:limit]
 
 
-def display_coins_page(page, coins):
-    """Display a page of coins (paginated)."""
-    start_idx  = page * COINS_PER_PAGE
-    end_idx    = start_idx + COINS_PER_PAGE
-    page_coins = coins[start_idx:end_idx]
-    total_pages = (len(coins) + COINS_PER_PAGE - 1) // COINS_PER_PAGE
+_search_index = None
 
-    print(f"\n{COLORS['yellow']}📖 Page {page+1}/{total_pages}{COLORS['reset']}")
-    print(f"{COLORS['green']}┌{'─' * 40}┐{COLORS['reset']}")
 
-    for i, coin in enumerate(page_coins):
-        num = start_idx + i + 1
-        trend_color  = COLORS['green'] if coin['price_change_24h'] >= 0 else COLORS['red']
-        trend_symbol = '▲' if coin['price_change_24h'] >= 0 else '▼'
-        price_display = format_price(coin['price'])
-        print(f"{num:2}. {coin['emoji']} {coin['name'][:20]:<20} {price_display:>12} {trend_color}{trend_symbol}{COLORS['reset']}")
+def get_search_index(coins):
+    """SearchIndex for this exact coins snapshot, rebuilt only when the snapshot changes."""
+    global _search_index
 
-    print(f"{COLORS['green']}└{'─' * 40}┘{COLORS['reset']}")
-    print(f"\n{COLORS['cyan']}N: Next Page  P: Prev Page  S: Search  Q: Quit{COLORS['reset']}")
+    index = _search_index
+    if index is None or index.coins is not coins:
+        index = SearchIndex(coins)
+        _search_index = index
+    return index
 
 
-def search_coins(query, coins):
+def search_coins(query, coins, limit=COINS_PER_PAGE):
     """
-    Improved search:
-      • Exact ticker      (e.g. “xmr” → coin['symbol'].lower())
-      • Exact ID          (e.g. “monero” → coin['id'])
-      • Name substring    (e.g. “mon” → coin['name'].lower())
-    Returns up to COINS_PER_PAGE matches.
+    Indexed search (see SearchIndex), ranked by match quality then market cap:
+      • Exact ticker      (e.g. “xmr”)
+      • Exact ID / alias / name (e.g. “monero”, “xbt”)
+      • Prefix            (e.g. “mon” → Monero, MONA, …)
+      • Name substring    (e.g. “coin” → Bitcoin, Dogecoin, …)
+      • Typo-tolerant     (e.g. “etherium” → Ethereum)
+    Returns up to `limit` (default COINS_PER_PAGE) coin dicts.
     """
-    query = query.strip().lower()
-    results = []
+    if not isinstance(coins, CoinTable):
+        coins = CoinTable.from_rows(coins)
+    index = get_search_index(coins)
+    return [coins.row(idx) for idx in index.search(query, limit)]
 
-    for coin in coins:
-        symbol_lower = coin['symbol'].lower()
-        id_lower     = coin['id']
-        name_lower   = coin['name'].lower()
 
-        if (query == symbol_lower) or (query == id_lower) or (query in name_lower):
-            results.append(coin)
-            if len(results) >= COINS_PER_PAGE:
-                break
+def get_historical_data(coin_id, days):
+    """
+    1) Check the in-memory cache (TTL per timeframe, see HIST_CACHE_TTL),
+       then the disk copy.
+    2) An expired copy that is less than STALE_GRACE_FACTOR TTLs past its
+       expiry is returned at once, while one background refresh runs
+       (stale-while-revalidate).
+    3) Otherwise refresh in the foreground (see refresh_history); concurrent
+       callers for the same series share one refresh (SingleFlight).
+    """
+    key = f"{coin_id}_{days}"
+    ttl = HIST_CACHE_TTL.get(days, 60)
+    cached = historical_cache.get(key)
+    if cached is not None and key not in dirty_series:
+        metrics.count('history_lookups', source='memory')
+        return cached
 
-    return results
+    expires = historical_cache.expiry(key)
+    if expires is None:
+        stored = disk_load_history(coin_id, BASE_CURRENCY, days)
+        if stored:
+            # Fresh or not, it’s the base for the next refresh
+            remaining = stored['ttl'] - (time.time() - stored['ts'])
+            historical_cache.put(key, stored['prices'], ttl=remaining)
+            if remaining > 0:
+                dirty_series.discard(key)
+                metrics.count('history_lookups', source='disk')
+                return stored['prices']
+            expires = historical_cache.expiry(key)
 
+    stale = historical_cache.peek(key)
+    if (STALE_WHILE_REVALIDATE and stale and expires is not None
+            and time.time() - expires < ttl * STALE_GRACE_FACTOR):
+        fetch_flights.start(key, refresh_history, coin_id, days)
+        metrics.count('history_lookups', source='revalidate')
+        return stale
+    return fetch_flights.do(key, refresh_history, coin_id, days)
 
-def get_historical_data(coin_id, days):
+
+def refresh_history(coin_id, days):
     """
-    1) Check a short (3s) cache. If fresh, return cached.
-    2) Otherwise, try whichever API is currently primary:
-       – If days == "max", use CoinGecko only.
-       – If historical_primary_api == "CoinGecko": attempt CoinGecko (with one retry).
-         If that fails, attempt CoinCap (for numeric days).
-       – If historical_primary_api == "CoinCap": attempt CoinCap first (numeric days).
-         If that fails, attempt CoinGecko.
-    3) Whichever yields data first becomes new primary (except "max" always CG). Cache and return data.
-    4) If both fail, return [] → “Data unavailable.”
+    Fetch a series for get_historical_data and cache it (memory and disk):
+      1) If the cached copy (in memory, else on disk) has expired but still
+         overlaps the window, fetch only the delta since its last point and
+         merge it in (see fetch_history_tail).
+      2) Otherwise, hedge across the APIs (see hedged_fetch), fastest first:
+         – If days == "max", use CoinGecko only.
+         – Else start the faster provider; race the other if it is slow or fails.
+      3) Cache and return whichever yields data first.
+      4) If everything fails, return the stale copy (marked dirty) or an empty
+         series → “Data unavailable.”
     """
-    global historical_primary_api
-
     now = time.time()
-    entry = historical_cache.get(f"{coin_id}_{days}")
-    if entry and (now - entry['ts'] < HIST_CACHE_TTL):
-        return entry['prices']
+    key = f"{coin_id}_{days}"
+    ttl = HIST_CACHE_TTL.get(days, 60)
+    cached = historical_cache.get(key)
+    if cached is not None and key not in dirty_series:
+        return cached   # refreshed by someone else meanwhile
 
-    user_currency = globals().get('user_currency', 'usd')
+    currency = BASE_CURRENCY   # converted for display, see display_coin_details
+
+    # Base for an incremental update: the expired in-memory copy, else the
+    # on-disk one (served as-is while still within its own TTL).
+    base = historical_cache.peek(key)
+    if not base:
+        stored = disk_load_history(coin_id, currency, days)
+        if stored:
+            age = now - stored['ts']
+            if age < stored['ttl']:
+                historical_cache.put(key, stored['prices'], ttl=stored['ttl'] - age)
+                dirty_series.discard(key)
+                metrics.count('history_lookups', source='disk')
+                return stored['prices']
+            base = stored['prices']
+
+    if base and (days == "max" or base[-1][0] > (now - days * 86400) * 1000):
+        prices = fetch_history_tail(coin_id, currency, days, base)
+        if prices:
+            historical_cache.put(key, prices, ttl=ttl)
+            disk_save_history(coin_id, currency, days, prices)
+            dirty_series.discard(key)
+            metrics.count('history_lookups', source='tail')
+            return prices
 
     # CoinGecko URL
-    if days == "max":
-        cg_url    = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        cg_params = {'vs_currency': user_currency, 'days': 'max'}
-    else:
-        cg_url    = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        cg_params = {'vs_currency': user_currency, 'days': days}
+    cg_url    = f"{COINGECKO_API_BASE}/coins/{coin_id}/market_chart"
+    cg_params = {'vs_currency': currency, 'days': days}
 
     def try_coin_gecko():
-        """Attempt CoinGecko, with one retry on failure."""
+        """Attempt CoinGecko (retries and backoff are handled by http_get)."""
         try:
-            resp = requests.get(cg_url, params=cg_params, timeout=10)
-            resp.raise_for_status()
-            return resp.json().get('prices', [])
+            resp = http_get(cg_url, params=cg_params, provider='CoinGecko', stream=True)
+            with metrics.span('parse', op='history'):
+                return stream_prices(resp)
         except Exception:
-            time.sleep(0.5)
-            try:
-                resp = requests.get(cg_url, params=cg_params, timeout=10)
-                resp.raise_for_status()
-                return resp.json().get('prices', [])
-            except Exception:
-                return []
+            return PriceSeries()
 
     def try_coincap():
         """
-        Attempt CoinCap’s “history” endpoint for numeric days only.
-        Interval logic based on days:
-          • days < 1  → 1-hour case (use 'm1' and start = now-ms * days * 86400000)
-          • days == 1 → 24-hour case (use 'h1')
-          • days >= 7 → daily case (use 'd1')
-          • if days > 365*2, CoinCap may not return full range, but we attempt.
+        Attempt CoinCap’s “history” endpoint for numeric days only
+        (interval picked by coincap_interval).
         """
         if days == "max":
-            return []  # CoinCap does not support "max" directly
+            return PriceSeries()  # CoinCap does not support "max" directly
 
-        now_ms     = int(time.time() * 1000)
-        ms_per_day = 86400000
-        start_ms   = now_ms - int(days * ms_per_day)
+        now_ms   = int(time.time() * 1000)
+        start_ms = now_ms - int(days * MS_PER_DAY)
+        return coincap_history(coin_id, coincap_interval(days), start_ms, now_ms)
 
-        if days < 1:
-            interval = 'm1'
-        elif days == 1:
-            interval = 'h1'
-        else:
-            interval = 'd1'
+    # If requesting all-time, skip CoinCap fallback
+    if days == "max":
+        providers = rank_providers(['CoinGecko'])
+    else:
+        providers = rank_providers(['CoinGecko', 'CoinCap'])
+    fetchers = {'CoinGecko': try_coin_gecko, 'CoinCap': try_coincap}
+    _, prices = hedged_fetch([(name, fetchers[name]) for name in providers], op='history')
+    if prices is None:
+        prices = PriceSeries()
+
+    if prices:
+        historical_cache.put(key, prices, ttl=ttl)
+        disk_save_history(coin_id, currency, days, prices)
+        dirty_series.discard(key)
+        metrics.count('history_lookups', source='full')
+    elif base:
+        # Every API failed: an out-of-date series beats “Data unavailable.”
+        # Keep it in memory but dirty, so the next view retries the delta.
+        prices = base
+        historical_cache.put(key, prices, ttl=0)
+        dirty_series.add(key)
+        metrics.count('history_lookups', source='stale')
+    else:
+        metrics.count('history_lookups', source='failed')
+    return prices
+
+
+def coincap_interval(days):
+    """
+    CoinCap history interval for a window (or tail) of `days`:
+      • days < 1  → 'm1'
+      • days == 1 → 'h1'
+      • days >= 7 → 'd1' (CoinCap may not return the full range past ~2 years)
+    """
+    if days < 1:
+        return 'm1'
+    if days == 1:
+        return 'h1'
+    return 'd1'
+
+
+def coincap_history(coin_id, interval, start_ms, end_ms):
+    """CoinCap /assets/{id}/history between start_ms and end_ms; empty series on failure."""
+    try:
+        resp = http_get(
+            f"{COINCAP_API_BASE}/assets/{coin_id}/history",
+            params={'interval': interval, 'start': start_ms, 'end': end_ms},
+            provider='CoinCap'
+        )
+        data = resp.json().get('data', [])
+        timestamps = array('q', (int(point.get('time', 0)) for point in data))
+        prices     = array('d', (float(point.get('priceUsd', 0) or 0) for point in data))
+        return PriceSeries(timestamps, prices)
+    except Exception:
+        return PriceSeries()
+
+
+def fetch_history_tail(coin_id, currency, days, prices):
+    """
+    Incremental refresh of a cached series: request only the points after its
+    last timestamp, append them at the series’ own resolution (the range
+    endpoint answers in 5-minute or hourly steps; see PriceSeries.merge_tail)
+    and evict points that fell out of the window.
+      • CoinGecko: market_chart/range (from/to in seconds).
+      • CoinCap:   history with start/end (ms); USD only, so it is raced only
+        for USD series — its points would not match another currency.
+    Providers are hedged like a full fetch. Returns the merged series, or an
+    empty one if every request failed (an empty delta is a success).
+    """
+    if not prices:
+        return PriceSeries()
+    last_ms = prices[-1][0]
+    now_ms  = int(time.time() * 1000)
 
-        url = f"https://api.coincap.io/v2/assets/{coin_id}/history"
+    def merge(tail):
+        merged = prices.merge_tail(tail)
+        if days != "max":
+            merged = merged.between(start_ms=now_ms - int(days * MS_PER_DAY))
+        return merged
+
+    def try_coin_gecko():
         try:
-            resp = requests.get(
-                url,
-                params={'interval': interval, 'start': start_ms, 'end': now_ms},
-                timeout=10
+            resp = http_get(
+                f"{COINGECKO_API_BASE}/coins/{coin_id}/market_chart/range",
+                params={'vs_currency': currency, 'from': last_ms // 1000 + 1, 'to': now_ms // 1000},
+                provider='CoinGecko',
+                stream=True
             )
-            resp.raise_for_status()
-            data = resp.json().get('data', [])
-            prices = []
-            for point in data:
-                price = float(point.get('priceUsd', 0) or 0)
-                time_ms = int(point.get('time', 0))
-                prices.append([time_ms, price])
-            return prices
+            with metrics.span('parse', op='history_tail'):
+                return merge(stream_prices(resp))
         except Exception:
-            return []
+            return PriceSeries()
 
-    prices = []
+    def try_coincap():
+        tail = coincap_history(coin_id, coincap_interval(days), last_ms + 1, now_ms)
+        # The history endpoint answers with an empty list on errors too, so
+        # only a non-empty delta counts as a result here.
+        return merge(tail) if tail else PriceSeries()
 
-    # If requesting all-time, skip CoinCap fallback
-    if days == "max":
-        prices = try_coin_gecko()
-        if prices:
-            historical_primary_api = "CoinGecko"
-    else:
-        if historical_primary_api == "CoinGecko":
-            prices = try_coin_gecko()
-            if prices:
-                pass
-            else:
-                prices = try_coincap()
-                if prices:
-                    historical_primary_api = "CoinCap"
-        else:  # primary == "CoinCap"
-            prices = try_coincap()
-            if prices:
-                pass
-            else:
-                prices = try_coin_gecko()
-                if prices:
-                    historical_primary_api = "CoinGecko"
+    names = ['CoinGecko', 'CoinCap'] if currency == 'usd' and days != "max" else ['CoinGecko']
+    fetchers = {'CoinGecko': try_coin_gecko, 'CoinCap': try_coincap}
+    _, merged = hedged_fetch([(name, fetchers[name]) for name in rank_providers(names)],
+                             op='history_tail')
+    return merged if merged is not None else PriceSeries()
 
-    historical_cache[f"{coin_id}_{days}"] = {'ts': now, 'prices': prices}
-    return prices
+
+def resample_prices(prices, days):
+    """
+    Slice the last `days` worth of points out of a longer series.
+    The window ends at the series’ last timestamp; its start is found by
+    binary search, so no extra download is needed for shorter timeframes.
+    """
+    if days == "max" or not prices:
+        return prices
+    start_ms = prices[-1][0] - int(days * MS_PER_DAY)
+    return prices.between(start_ms=start_ms)
 
 
 def calculate_price_change(prices):
     """Calculate percentage price change between first and last data points."""
-    if len(prices) < 2:
-        return 0
-    start_price = prices[0][1]
-    end_price   = prices[-1][1]
-    return ((end_price - start_price) / start_price) * 100
+    if not isinstance(prices, PriceSeries):
+        prices = PriceSeries.from_pairs(prices)
+    return prices.change()
 
 
 def display_coin_details(coin):
@@ -464,78 +3146,211 @@ def display_coin_details(coin):
 
     trend_color   = COLORS['green'] if coin['price_change_24h'] >= 0 else COLORS['red']
     trend_symbol  = '▲' if coin['price_change_24h'] >= 0 else '▼'
-    user_currency = globals().get('user_currency', 'usd').upper()
+    user_currency = local_currency().upper()
+    rate          = currency_rate(user_currency)   # histories are stored in BASE_CURRENCY
     price_display = format_price(coin['price'])
     print(f"\nCurrent Price: {COLORS['white']}{price_display} {user_currency}{COLORS['reset']}")
     print(f"24h Change:    {trend_color}{trend_symbol} {abs(coin['price_change_24h']):.2f}%{COLORS['reset']}")
 
-    print(f"\n{COLORS['blue']}Historical Trends ({historical_primary_api} primary):{COLORS['reset']}")
-    # Timeframes now match CoinGecko: 24h, 7d, 1m, 3m, 1y, Max
-    time_frames = [
-        ('24h', 'Past 24h',    1),
-        ('7d',  'Past 7d',     7),
-        ('1m',  'Past 1m',    30),
-        ('3m',  'Past 3m',    90),
-        ('1y',  'Past 1y',   365),
-        ('max','All Time',   'max')
-    ]
-
-    for timeframe, label, days in time_frames:
-        prices = get_historical_data(coin['id'], days)
-        if not prices:
-            continue
+    fastest = (rank_providers(['CoinGecko', 'CoinCap']) or ['no provider available'])[0]
+    print(f"\n{COLORS['blue']}Historical Trends ({fastest} fastest):{COLORS['reset']}")
+    # Timeframes match CoinGecko: 24h, 7d, 1m, 3m, 1y, Max (see TIME_FRAMES)
+
+    # Group the windows by the series they are resampled from, so the screen
+    # costs one download per source series rather than one per row.
+    by_source = {}
+    for _, label, days in TIME_FRAMES:
+        by_source.setdefault(HIST_SOURCE_DAYS.get(days, days), []).append((label, days))
 
-        price_change   = calculate_price_change(prices)
-        trend_color    = COLORS['green'] if price_change >= 0 else COLORS['red']
-        trend_symbol   = '▲' if price_change >= 0 else '▼'
-        start_price    = prices[0][1]
-        end_price      = prices[-1][1]
-        start_display  = format_price(start_price)
-        end_display    = format_price(end_price)
+    # Fetch the source series concurrently and print rows as each one lands,
+    # so the slowest download never holds back the others.
+    deadline = time.time() + HIST_SCREEN_DEADLINE
+    executor = ThreadPoolExecutor(max_workers=len(TIME_FRAMES))
+    pending  = {
+        executor.submit(get_historical_data, coin['id'], source): (source, rows)
+        for source, rows in by_source.items()
+    }
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=max(0, deadline - time.time()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                source, rows = pending.pop(future)
+                try:
+                    prices = future.result()
+                except Exception:
+                    prices = PriceSeries()
+                for label, days in rows:
+                    if prices or source == days:
+                        print_trend_row(label, resample_prices(prices, days).scaled(rate))
+                    else:
+                        # Source series unavailable: fetch this window on its own
+                        # so the CoinCap fallback still gets a chance.
+                        pending[executor.submit(get_historical_data, coin['id'], days)] = (days, [(label, days)])
 
-        # Keep spaces around arrow but ensure % stays adjacent to number
-        print(f"{label}: {trend_color}{trend_symbol} {abs(price_change):.2f}%{COLORS['reset']} "
-              f"(Start: {start_display} → End: {end_display})")
+        if pending:
+            labels = [label for _, rows in pending.values() for label, _ in rows]
+            print(f"{COLORS['yellow']}⏱️ Timed out waiting for: {', '.join(labels)}{COLORS['reset']}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
-def get_network_fee(coin_id):
+def print_trend_row(label, prices):
+    """Print one “Past X: ▲ 1.23% (Start → End)” line; skip if there is no data."""
+    if not prices:
+        return
+
+    price_change   = calculate_price_change(prices)
+    trend_color    = COLORS['green'] if price_change >= 0 else COLORS['red']
+    trend_symbol   = '▲' if price_change >= 0 else '▼'
+    start_price    = prices[0][1]
+    end_price      = prices[-1][1]
+    start_display  = format_price(start_price)
+    end_display    = format_price(end_price)
+
+    # Keep spaces around arrow but ensure % stays adjacent to number
+    print(f"{label}: {trend_color}{trend_symbol} {abs(price_change):.2f}%{COLORS['reset']} "
+          f"(Start: {start_display} → End: {end_display})")
+
+
+# ————— Network fees —————
+# Source name → parser of its JSON into {'fast', 'medium', 'slow'}
+FEE_PARSERS = {
+    'mempool.space':    lambda data: {'fast':   data['fastestFee'],            # sat/vB
+                                      'medium': data['halfHourFee'],
+                                      'slow':   data['hourFee']},
+    'blockstream.info': lambda data: {'fast':   data['1'],                     # sat/vB by target blocks
+                                      'medium': data['3'],
+                                      'slow':   data['6']},
+    'beaconcha.in':     lambda data: {'fast':   data['data']['rapid'] / 1e9,   # wei → gwei
+                                      'medium': data['data']['standard'] / 1e9,
+                                      'slow':   data['data']['slow'] / 1e9},
+    'ethgasstation':    lambda data: {'fast':   data['fast'] / 10,             # 0.1 gwei → gwei
+                                      'medium': data['average'] / 10,
+                                      'slow':   data['safeLow'] / 10},
+    'xmrchain.net':     lambda data: {'fast':   data['data']['fee_per_kb'] * 2.5 / 1e12,   # XMR per tx
+                                      'medium': data['data']['fee_per_kb'] * 2.0 / 1e12,
+                                      'slow':   data['data']['fee_per_kb'] * 1.5 / 1e12},
+    'localmonero':      lambda data: {'fast':   data['fee_per_byte'] * 2500 / 1e12,
+                                      'medium': data['fee_per_byte'] * 2000 / 1e12,
+                                      'slow':   data['fee_per_byte'] * 1500 / 1e12},
+}
+
+# Chain → (unit of its fee rates, coins per typical transaction per unit)
+FEE_UNITS = {
+    'btc': ('sat/vB', 140 / 1e8),     # ~140 vB for a 1-in / 2-out segwit payment
+    'eth': ('gwei',   21000 / 1e9),   # plain transfer: 21,000 gas
+    'xmr': ('XMR',    1),             # already per transaction
+}
+
+
+class FeeEstimator:
     """
-    Get current network fees for transactions (in the coin’s native units).
-    Returns a dict with keys 'fast', 'medium', 'slow'.
+    Background poller for network fees, in the spirit of CoinListRefresher:
+      • Every FEE_REFRESH_RATE seconds, all chains in FEE_API_ENDPOINTS are
+        polled concurrently; within a chain the sources are tried in order
+        until one answers and parses.
+      • The latest estimate per chain is kept with its source and timestamp.
+        A failed poll keeps the previous estimate and records the error; it
+        is flagged stale once older than FEE_STALE_AFTER.
+      • get() only reads memory, so it never blocks on the network.
     """
-    try:
-        if coin_id == 'btc':
-            response = requests.get(FEE_API_ENDPOINTS['btc'], timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            return {
-                'fast':   data['fastestFee'],
-                'medium': data['halfHourFee'],
-                'slow':   data['hourFee']
-            }
-        elif coin_id == 'eth':
-            response = requests.get(FEE_API_ENDPOINTS['eth'], timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            return {
-                'fast':   data['fast'] / 10,
-                'medium': data['average'] / 10,
-                'slow':   data['safeLow'] / 10
-            }
-        elif coin_id == 'xmr':
-            response = requests.get(FEE_API_ENDPOINTS['xmr'], timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            return {
-                'fast':   data['fee_per_byte'] * 2500 / 1e12,
-                'medium': data['fee_per_byte'] * 2000 / 1e12,
-                'slow':   data['fee_per_byte'] * 1500 / 1e12
-            }
-        else:
+
+    def __init__(self):
+        self.estimates = {}   # chain → {'fees', 'source', 'ts', 'error'}
+        self._lock     = threading.Lock()
+        self._thread   = None
+        self._wake     = threading.Event()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def refresh_now(self):
+        self._wake.set()
+
+    def get(self, chain):
+        """Latest estimate for `chain` plus 'age' (seconds) and 'stale', or None."""
+        with self._lock:
+            entry = self.estimates.get(chain)
+        if entry is None:
             return None
-    except Exception as e:
-        print(f"{COLORS['red']}⚠️ Fee API Error: {str(e)}{COLORS['reset']}")
-        return None
+        age = time.time() - entry['ts'] if entry['fees'] else None
+        return dict(entry, age=age, stale=age is None or age > FEE_STALE_AFTER)
+
+    def poll(self):
+        """Poll every chain once (concurrently) and store the results."""
+        chains = list(FEE_API_ENDPOINTS)
+        with ThreadPoolExecutor(max_workers=max(1, len(chains))) as pool:
+            results = list(pool.map(self._poll_chain, chains))
+        with self._lock:
+            for chain, (source, fees, error) in zip(chains, results):
+                if fees:
+                    self.estimates[chain] = {'fees': fees, 'source': source, 'ts': time.time(), 'error': None}
+                else:
+                    previous = self.estimates.get(chain, {'fees': None, 'source': None, 'ts': 0})
+                    self.estimates[chain] = dict(previous, error=error)
+
+    def _poll_chain(self, chain):
+        errors = []
+        for name, url in FEE_API_ENDPOINTS[chain]:
+            try:
+                with metrics.span('provider_call', op='network_fee', provider=name):
+                    data = http_get(url, timeout=FEE_TIMEOUT, retries=0).json()
+                    fees = {tier: float(value) for tier, value in FEE_PARSERS[name](data).items()}
+                return name, fees, None
+            except Exception as e:
+                errors.append(f"{name}: {type(e).__name__}")
+        return None, None, '; '.join(errors)
+
+    def _run(self):
+        while True:
+            self.poll()
+            self._wake.wait(timeout=FEE_REFRESH_RATE)
+            self._wake.clear()
+
+
+fee_estimator = FeeEstimator()
+
+
+def get_network_fee(coin_id):
+    """
+    Current network fees for a chain ticker ('btc', 'eth', 'xmr'), in the
+    units of FEE_UNITS. Returns a dict with keys 'fast', 'medium', 'slow', or
+    None if no source has answered yet. Reads FeeEstimator’s cache only.
+    """
+    entry = fee_estimator.get(coin_id)
+    metrics.count('fee_lookups', chain=coin_id, result='hit' if entry and entry['fees'] else 'miss')
+    return entry['fees'] if entry else None
+
+
+def print_network_fees(coin):
+    """Print the cached network fees for `coin`’s chain (with fiat per typical tx)."""
+    chain = coin['symbol'].lower()
+    if chain not in FEE_API_ENDPOINTS:
+        return
+    entry = fee_estimator.get(chain)
+    print(f"\n{COLORS['blue']}Network fees:{COLORS['reset']}")
+    if not entry or not entry['fees']:
+        reason = entry['error'] if entry and entry.get('error') else 'waiting for the first estimate'
+        print(f"  {COLORS['yellow']}Not available ({reason}){COLORS['reset']}")
+        return
+
+    unit, per_tx = FEE_UNITS[chain]
+    user_currency = local_currency().upper()
+    for tier in ('fast', 'medium', 'slow'):
+        rate = entry['fees'][tier]
+        print(f"  {tier.title():<7} {rate:.6g} {unit} "
+              f"(≈ {user_currency} {format_price(rate * per_tx * coin['price'])} per tx)")
+    note = f"via {entry['source']}, {int(entry['age'])}s ago"
+    if entry['stale']:
+        print(f"  {COLORS['yellow']}⚠️ Stale: {note}{COLORS['reset']}")
+    else:
+        print(f"  {note}")
+# ————————————————————————————————
 
 
 def get_exchange_fees(pair):
@@ -558,25 +3373,26 @@ def get_exchange_fees(pair):
 
 def display_fee_info(coin):
     """
+    0) Show the coin’s network fees from the FeeEstimator cache.
     1) Build a small menu of all “coin → other” exchange pairs.
     2) Let the user pick one (1..N).
     3) Show that pair’s fees (variable%, fixed + fiat equivalent, min + fiat equivalent).
     4) “3” is used to go back to the coin details.
     """
-    clear_screen()
-    user_currency = globals().get('user_currency', 'usd').upper()
-    print(f"\n{COLORS['yellow']}┌───────────────────────────────────┐")
-    print(f"│   {coin['emoji']} {coin['name']} ({coin['symbol']}) Fees   │")
-    print(f"└───────────────────────────────────┘{COLORS['reset']}")
+    user_currency = local_currency().upper()
+
+    def header():
+        """Coin title plus its cached network fees (no request is made here)."""
+        clear_screen()
+        print(f"\n{COLORS['yellow']}┌───────────────────────────────────┐")
+        print(f"│   {coin['emoji']} {coin['name']} ({coin['symbol']}) Fees   │")
+        print(f"└───────────────────────────────────┘{COLORS['reset']}")
+        print_network_fees(coin)
+
+    header()
 
-    direct_pairs = []
-    for pair_key in EXCHANGE_PAIRS:
-        base_id, quote_id = pair_key.split('_')
-        if base_id == coin['id']:
-            base_coin  = next((c for c in coins_list if c['id'] == base_id), None)
-            quote_coin = next((c for c in coins_list if c['id'] == quote_id), None)
-            if base_coin and quote_coin:
-                direct_pairs.append((pair_key, base_coin, quote_coin))
+    # Pair keys use tickers (xmr_btc); the registry resolves them to coins
+    direct_pairs = get_coin_registry(coins_list).pairs_for(coin['id'])
 
     if not direct_pairs:
         print(f"\n{COLORS['yellow']}No direct exchange pairs found for {coin['symbol']}.{COLORS['reset']}")
@@ -601,10 +3417,7 @@ def display_fee_info(coin):
                 if not fee_data:
                     print(f"{COLORS['red']}Error: could not fetch fees for that pair.{COLORS['reset']}")
                     any_key()
-                    clear_screen()
-                    print(f"\n{COLORS['yellow']}┌───────────────────────────────────┐")
-                    print(f"│   {coin['emoji']} {coin['name']} ({coin['symbol']}) Fees   │")
-                    print(f"└───────────────────────────────────┘{COLORS['reset']}")
+                    header()
                     continue
 
                 fixed_fee_crypto   = fee_data['fee_fixed']
@@ -629,26 +3442,16 @@ def display_fee_info(coin):
                     f"(≈ {user_currency} {format_price(min_amount_fiat)})"
                 )
                 any_key()
-
-                clear_screen()
-                print(f"\n{COLORS['yellow']}┌───────────────────────────────────┐")
-                print(f"│   {coin['emoji']} {coin['name']} ({coin['symbol']}) Fees   │")
-                print(f"└───────────────────────────────────┘{COLORS['reset']}\n")
+                header()
 
             else:
                 print(f"{COLORS['red']}Invalid selection!{COLORS['reset']}")
                 any_key()
-                clear_screen()
-                print(f"\n{COLORS['yellow']}┌───────────────────────────────────┐")
-                print(f"│   {coin['emoji']} {coin['name']} ({coin['symbol']}) Fees   │")
-                print(f"└───────────────────────────────────┘{COLORS['reset']}\n")
+                header()
         except ValueError:
             print(f"{COLORS['red']}Enter a number between 1 and {len(direct_pairs)}, or 3 to go back.{COLORS['reset']}")
             any_key()
-            clear_screen()
-            print(f"\n{COLORS['yellow']}┌───────────────────────────────────┐")
-            print(f"│   {coin['emoji']} {coin['name']} ({coin['symbol']}) Fees   │")
-            print(f"└───────────────────────────────────┘{COLORS['reset']}\n")
+            header()
 
 
 def convert_currency(coin):
@@ -657,8 +3460,8 @@ def convert_currency(coin):
     “3” is Go Back, instead of “B”.
     """
     try:
-        user_currency = globals().get('user_currency', 'usd').upper()
         while True:
+            user_currency = local_currency().upper()
             display_coin_details(coin)
             print(f"\n{COLORS['cyan']}Options:")
             print(f"1. Convert {user_currency} to {coin['symbol']}")
@@ -707,7 +3510,7 @@ def switch_api_menu():
     """
     Submenu to let the user pick which API to use first for top-100 coin list.
     """
-    global coinlist_primary_api, coins_list, current_page, last_update, active_api
+    global coinlist_primary_api
 
     clear_screen()
     print(f"{COLORS['yellow']}┌──────────────────────────────┐")
@@ -716,34 +3519,419 @@ def switch_api_menu():
     print("\nCurrent primary API:", coinlist_primary_api)
     print("1. CoinGecko")
     print("2. CoinCap")
+    print("3. Auto (fastest by measured latency)")
     print("Press Enter to keep current.\n")
 
-    choice = input(f"{COLORS['blue']}Choice (1-2 or Enter): {COLORS['reset']}").strip()
+    choice = input(f"{COLORS['blue']}Choice (1-3 or Enter): {COLORS['reset']}").strip()
     if choice == '1':
         coinlist_primary_api = "CoinGecko"
     elif choice == '2':
         coinlist_primary_api = "CoinCap"
+    elif choice == '3':
+        coinlist_primary_api = "Auto"
     # Else keep current if Enter or invalid
 
-    # Force a refresh by resetting last_update, so active_api updates immediately
-    last_update = 0
-    full_coins = get_coins_list()
-    coins_list = full_coins[:]
-    current_page = 0
+    # Refresh in the background right away, so active_api updates shortly
+    coins_cache.pop(f"coins_{BASE_CURRENCY}")
+    coins_refresher.refresh_now()
 
-    print(f"\nNew primary API: {coinlist_primary_api}")
+    print(f"\nNew primary API: {coinlist_primary_api} (refreshing in the background)")
     any_key()
 
 
+def currency_menu(first_run=False):
+    """
+    Show SUPPORTED_CURRENCIES and ask for one. Returns the lower-case code,
+    or None if Enter was pressed or the code is unknown.
+    """
+    clear_screen()
+    title = "SELECT YOUR LOCAL CURRENCY (FIRST RUN)" if first_run else "SELECT DISPLAY CURRENCY"
+    print(f"{COLORS['yellow']}┌──────────────────────────────────────────────┐")
+    print(f"│   {title:^38}   │")
+    print(f"└──────────────────────────────────────────────┘{COLORS['reset']}")
+    print("\nBelow is the list of currency codes (fiat and crypto) prices can be shown in.")
+    if first_run:
+        print("Type one of those codes and press Enter, or press Enter alone to default to USD.\n")
+    else:
+        print("Type one of those codes and press Enter, or press Enter alone to keep the current one.\n")
+
+    # Display in rows of 8 codes each
+    per_row = 8
+    for i in range(0, len(SUPPORTED_CURRENCIES), per_row):
+        chunk = SUPPORTED_CURRENCIES[i:i+per_row]
+        print("  " + "   ".join(chunk))
+    print()
+
+    choice = input(f"{COLORS['blue']}Currency: {COLORS['reset']}").strip().upper()
+    if choice == '' or choice not in SUPPORTED_CURRENCIES:
+        return None
+    return choice.lower()
+
+
+# ————— Headless batch mode —————
+def parse_batch_query(text, default_amount=None):
+    """
+    One batch query → (coin, amount): 'btc', 'btc:250', 'btc 250' or
+    'btc,250' (an id, ticker or alias, then an optional amount in the
+    requested currency). None for a blank line; ValueError for a bad amount.
+    """
+    parts = re.split(r'[\s,:]+', text.strip(), maxsplit=1)
+    if not parts[0]:
+        return None
+    amount = float(parts[1]) if len(parts) > 1 and parts[1] else default_amount
+    return parts[0], amount
+
+
+def batch_query(queries, currency=None, timeframes=(), amount=None):
+    """
+    Library entry point for scripted lookups: no prompts, no screen, no
+    loading animation. `queries` is any iterable of query strings (see
+    parse_batch_query); `timeframes` are TIME_FRAMES keys ('24h', '7d', …).
+    Returns a generator of one dict per query, in input order:
+      query, id, symbol, name, currency, price, change_24h (market), amount,
+      coin_amount (amount converted to the coin), trend_<timeframe>… (% change
+      over each requested window, e.g. trend_7d), ts
+    or {query, error} if it could not be resolved.
+    Queries are handled BATCH_CHUNK_SIZE at a time:
+      • Coins in the (cached) coin list resolve locally; the rest are
+        quoted from CoinGecko in one batched request.
+      • Every history a chunk needs is fetched once, BATCH_WORKERS at a time,
+        through the usual caches, and rows stream out as their data lands.
+    Raises ValueError for an unknown timeframe or currency.
+    """
+    windows = dict((key, days) for key, _, days in TIME_FRAMES)
+    unknown = [key for key in timeframes if key not in windows]
+    if unknown:
+        raise ValueError(f"unknown timeframe(s): {', '.join(unknown)} (use {', '.join(windows)})")
+    frames   = [(key, windows[key]) for key in timeframes]
+    currency = (currency or BASE_CURRENCY).lower()
+    if currency_rate(currency) is None:
+        get_fx_rates()
+    rate = currency_rate(currency)
+    if rate is None:
+        raise ValueError(f"no exchange rate for {currency.upper()}")
+
+    if not coins_list:
+        load_cached_coins()
+    if not coins_list or time.time() - last_update >= DISK_COINS_TTL:
+        get_coins_list(background=True)
+    registry = get_coin_registry(coins_list) if coins_list else None
+
+    def rows():
+        pending = iter(queries)
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            while True:
+                chunk = [text for _, text in zip(range(BATCH_CHUNK_SIZE), pending)]
+                if not chunk:
+                    return
+                yield from _batch_chunk(chunk, registry, pool, currency, rate, frames, amount)
+
+    return rows()
+
+
+def _batch_chunk(chunk, registry, pool, currency, rate, frames, default_amount):
+    """Resolve and yield one chunk of batch_query (see there)."""
+    items = []   # {'query', 'key', 'amount', 'coin', 'error'}
+    for text in chunk:
+        text = text.strip()
+        try:
+            parsed = parse_batch_query(text, default_amount)
+        except ValueError:
+            items.append({'query': text, 'coin': None, 'error': 'invalid amount'})
+            continue
+        if parsed is None:
+            continue
+        key, amount = parsed
+        coin = registry.get(key) if registry else None
+        if coin is not None:
+            coin = {'id': coin.id, 'symbol': coin.symbol, 'name': coin.name,
+                    'price': coin.table.prices[coin.idx], 'change_24h': coin.price_change_24h}
+        items.append({'query': text, 'key': key.lower(), 'amount': amount, 'coin': coin, 'error': None})
+
+    # Coins outside the list: one batched quote request for all of them
+    missing = [item['key'] for item in items if item['coin'] is None and not item['error']]
+    quotes  = fetch_quotes(missing, provider='CoinGecko') if missing else {}
+
+    histories = {}   # (coin id, source days) → future, shared by the whole chunk
+    for item in items:
+        if item['coin'] is None and not item['error']:
+            if item['key'] not in quotes:
+                item['error'] = 'unknown coin'
+                continue
+            price, change = quotes[item['key']]
+            item['coin'] = {'id': item['key'], 'symbol': None, 'name': None,
+                            'price': price, 'change_24h': change}
+        if item['coin'] is not None:
+            for _, days in frames:
+                source = (item['coin']['id'], HIST_SOURCE_DAYS.get(days, days))
+                if source not in histories:
+                    histories[source] = pool.submit(get_historical_data, *source)
+
+    for item in items:
+        coin = item['coin']
+        if coin is None:
+            yield {'query': item['query'], 'error': item['error']}
+            continue
+        price, amount = coin['price'] * rate, item['amount']
+        row = {
+            'query':       item['query'],
+            'id':          coin['id'],
+            'symbol':      coin['symbol'],
+            'name':        coin['name'],
+            'currency':    currency,
+            'price':       price,
+            'change_24h':  coin['change_24h'],
+            'amount':      amount,
+            'coin_amount': amount / price if amount is not None and price else None,
+        }
+        for key, days in frames:
+            try:
+                prices = histories[(coin['id'], HIST_SOURCE_DAYS.get(days, days))].result()
+            except Exception:
+                prices = PriceSeries()
+            window = resample_prices(prices, days)
+            row[f"trend_{key}"] = window.change() if len(window) > 1 else None
+        row['ts'] = int(time.time())
+        yield row
+
+
+def batch_fields(timeframes=()):
+    """Column order of batch_query rows (CSV header)."""
+    return (['query', 'id', 'symbol', 'name', 'currency', 'price', 'change_24h', 'amount', 'coin_amount']
+            + [f"trend_{key}" for key in timeframes] + ['ts', 'error'])
+
+
+def write_batch(rows, fmt='jsonl', timeframes=(), out=None):
+    """
+    Stream batch_query rows to `out` (stdout) as JSON Lines or CSV, flushing
+    every row so a pipeline sees results as they come. Returns the number
+    of rows with an error.
+    """
+    out    = out or sys.stdout
+    errors = 0
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=batch_fields(timeframes), extrasaction='ignore')
+        writer.writeheader()
+    for row in rows:
+        errors += 'error' in row
+        if writer:
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row, ensure_ascii=False) + '\n')
+        out.flush()
+    return errors
+# ————————————————————————————————
+
+
+# ————— Server mode —————
+class ApiError(Exception):
+    """An HTTP error answer of server mode: status code + message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+api_flights = SingleFlight()   # FX loads and conversions (lists and series coalesce in the core)
+
+
+def api_rate(query):
+    """(currency, units per BASE_CURRENCY) for a request’s ?currency= (default usd)."""
+    currency = query.get('currency', BASE_CURRENCY).lower()
+    if currency_rate(currency) is None:
+        api_flights.do('fx', get_fx_rates)
+    rate = currency_rate(currency)
+    if rate is None:
+        raise ApiError(400, f"no exchange rate for {currency.upper()}")
+    return currency, rate
+
+
+def api_coins_list():
+    """The current coin list; only a cold start waits for (one) download."""
+    if not coins_list:
+        get_coins_list(background=True)   # coalesced in the core (SingleFlight)
+    if not coins_list:
+        raise ApiError(503, "coin list unavailable")
+    return coins_list
+
+
+def api_coins(query):
+    """GET /coins?currency=&limit=&offset=&q= → the ranked list (or search results)."""
+    currency, rate = api_rate(query)
+    coins = api_coins_list()
+    try:
+        limit  = max(0, int(query.get('limit', 100)))
+        offset = max(0, int(query.get('offset', 0)))
+    except ValueError:
+        raise ApiError(400, "limit and offset must be integers")
+    if query.get('q'):
+        rows = search_coins(query['q'], coins, limit=offset + limit)[offset:]
+    else:
+        rows = coins[offset:offset + limit]
+    return {
+        'currency': currency,
+        'updated':  int(last_update),
+        'provider': active_api,
+        'total':    len(coins),
+        'coins': [{'id': coin.id, 'symbol': coin.symbol, 'name': coin.name,
+                   'price': coins.prices[coin.idx] * rate, 'change_24h': coin.price_change_24h,
+                   'market_cap': coins.market_caps[coin.idx] * rate} for coin in rows],
+    }
+
+
+def api_history(coin_key, query):
+    """
+    GET /coin/{id}/history?days=&currency= → [[ts_ms, price], …] for one
+    window (a TIME_FRAMES key like '7d', a number of days or 'max').
+    """
+    currency, rate = api_rate(query)
+    windows = dict((key, days) for key, _, days in TIME_FRAMES)
+    days = query.get('days', '1')
+    if days in windows:
+        days = windows[days]
+    elif days != 'max':
+        try:
+            days = float(days)
+            days = int(days) if days.is_integer() else days
+        except ValueError:
+            raise ApiError(400, f"bad days: {days}")
+        if not math.isfinite(days) or days <= 0:
+            raise ApiError(400, "days must be a positive number")
+
+    coin = get_coin_registry(coins_list).get(coin_key) if coins_list else None
+    coin_id = coin.id if coin else coin_key.lower()
+    source = HIST_SOURCE_DAYS.get(days, days)
+    prices = get_historical_data(coin_id, source)
+    if not prices:
+        raise ApiError(404 if coin is None else 503, f"no history for {coin_key}")
+    window = resample_prices(prices, days).scaled(rate)
+    return {
+        'id':       coin_id,
+        'days':     days,
+        'currency': currency,
+        'change':   window.change(),
+        'prices':   window.to_pairs(),
+    }
+
+
+def api_convert(query):
+    """
+    GET /convert?coin=btc,eth&amount=&currency=&timeframes= → batch_query rows
+    (identical concurrent requests share one computation).
+    """
+    coins = [key for key in query.get('coin', '').split(',') if key.strip()]
+    if not coins:
+        raise ApiError(400, "coin is required")
+    try:
+        amount = float(query['amount']) if query.get('amount') else None
+    except ValueError:
+        raise ApiError(400, "amount must be a number")
+    timeframes = tuple(key for key in query.get('timeframes', '').split(',') if key)
+    currency   = query.get('currency', BASE_CURRENCY).lower()
+    api_coins_list()
+
+    def convert():
+        return list(batch_query(coins, currency, timeframes, amount))
+
+    try:
+        rows = api_flights.do(('convert', tuple(coins), amount, currency, timeframes), convert)
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    return {'results': rows}
+
+
+class CheckerRequestHandler(BaseHTTPRequestHandler):
+    """Routes the server-mode endpoints (see CheckerHTTPServer) and answers JSON."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url   = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        status, body = 200, None
+        try:
+            with metrics.span('api_request', endpoint=parts[0] if parts else '/'):
+                if parts == ['coins']:
+                    body = api_coins(query)
+                elif len(parts) == 3 and parts[0] == 'coin' and parts[2] == 'history':
+                    body = api_history(parts[1], query)
+                elif parts == ['convert']:
+                    body = api_convert(query)
+                elif parts == ['metrics']:
+                    self.send_body(200, metrics.to_prometheus().encode(), 'text/plain; version=0.0.4')
+                    return
+                else:
+                    raise ApiError(404, "not found (try /coins, /coin/{id}/history, /convert)")
+        except ApiError as e:
+            status, body = e.status, {'error': str(e)}
+        except Exception as e:
+            status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+        self.send_body(status, json.dumps(body).encode(), 'application/json')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CheckerHTTPServer(ThreadingHTTPServer):
+    """
+    Server mode: the fetch / cache / fallback core runs once and answers many
+    local clients over HTTP, so they share one cache and one set of rate
+    limits instead of each hitting the APIs:
+      • GET /coins?currency=eur&limit=100&offset=0&q=mon
+      • GET /coin/{id}/history?days=7d&currency=eur
+      • GET /convert?coin=btc,eth&amount=250&currency=eur&timeframes=24h,7d
+      • GET /metrics (Prometheus text)
+    Concurrent requests for the same upstream data are coalesced (see
+    SingleFlight; expired data is served while it revalidates), and the
+    background refresher keeps the coin list warm.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host=SERVE_HOST, port=SERVE_PORT):
+        super().__init__((host, port), CheckerRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_api(host=SERVE_HOST, port=SERVE_PORT):
+    """Run server mode in the foreground until Ctrl+C."""
+    if not coins_list:
+        load_cached_coins()
+    coins_refresher.start()
+    server = CheckerHTTPServer(host, port)
+    print(f"{COLORS['green']}Serving the CryptoChecker API on {server.url} (Ctrl+C to stop){COLORS['reset']}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+# ————————————————————————————————
+
+
 def main_session():
     """
     Single session of the converter. On the very first call, prompts for:
       1) Platform (Windows / Android / Other)
       2) Prompt for user’s local currency (default USD)
     Then enters a loop to display top coins, search, paginate, select, etc.
-    Every REFRESH_RATE seconds, the top-100 list is re-fetched automatically.
-    We display “API SELECTED = <API>” just under the header (in blue),
-    and show “Last refresh / Next refresh” plus “A: Switch API” at the bottom."""
+    Every REFRESH_RATE seconds, the top-100 list is re-fetched automatically by
+    a background thread; the current page and search stay put across refreshes.
+    We display “API SELECTED = <API>” just under the header (in blue), followed
+    by each provider’s circuit-breaker state, latency and error rate,
+    and show “Last refresh / Next refresh” plus “A: Switch API” at the bottom.
+    “C: Currency” switches the display currency instantly (see set_currency).
+    With --stats, timings and cache hit rates are shown under the menu."""
     global current_page, last_update, coins_list, active_api
 
     # --- First-run block (only executes once) ---
@@ -752,69 +3940,69 @@ def main_session():
         globals()['platform_type'] = first_run_setup()
 
         # 2) Prompt for currency once, now with full supported list
-        clear_screen()
-        print(f"{COLORS['yellow']}┌──────────────────────────────────────────────┐")
-        print("│   SELECT YOUR LOCAL CURRENCY (FIRST RUN)   │")
-        print(f"└──────────────────────────────────────────────┘{COLORS['reset']}")
-        print("\nBelow is the list of 3-letter fiat codes supported by CoinGecko.")
-        print("Type one of those codes and press Enter, or press Enter alone to default to USD.\n")
-
-        # Display in rows of 8 codes each
-        per_row = 8
-        for i in range(0, len(SUPPORTED_CURRENCIES), per_row):
-            chunk = SUPPORTED_CURRENCIES[i:i+per_row]
-            print("  " + "   ".join(chunk))
-        print()
-
-        choice = input(f"{COLORS['blue']}Currency: {COLORS['reset']}").strip().upper()
-        if choice == '' or choice not in SUPPORTED_CURRENCIES:
-            user_currency = 'usd'
-        else:
-            user_currency = choice.lower()
-        globals()['user_currency'] = user_currency
+        globals()['user_currency'] = currency_menu(first_run=True) or 'usd'
 
         # Mark first run as done
         globals()['first_run'] = False
 
     # --- End first-run block ---
 
-    # Initial load of coins_list
-    full_coins = get_coins_list()
-    coins = full_coins[:]
+    # Initial load of coins_list: render the last saved list instantly if
+    # there is one; only a truly cold start waits for the network. From here
+    # on the background refresher keeps the list fresh.
+    if not coins_list and not load_cached_coins():
+        get_coins_list()
+    set_currency(globals()['user_currency'])   # FX table from disk, or fetched in the background
+    coins_refresher.start()
+    fee_estimator.start()
+    full_coins = coins_list
+    coins = full_coins
+    search_term = None
     current_page = 0
 
     while True:
-        # If REFRESH_RATE has passed since last_update, re-fetch top 100
-        if time.time() - last_update >= REFRESH_RATE:
-            full_coins = get_coins_list()
-            coins = full_coins[:]
-            current_page = 0
-
-        clear_screen()
+        # Pick up a snapshot the refresher swapped in, keeping the current
+        # search and page (clamped if the list got shorter)
+        if full_coins is not coins_list:
+            full_coins = coins_list
+            coins = search_coins(search_term, full_coins) if search_term else full_coins
+            total_pages = max(1, (len(coins) + COINS_PER_PAGE - 1) // COINS_PER_PAGE)
+            current_page = min(current_page, total_pages - 1)
 
-        # Header
-        uc = globals().get('user_currency', 'usd').upper()
-        if globals()['platform_type'] == 'android':
-            print(f"\n{COLORS['yellow']}🪙 CRYPTO CONVERTER (Top 100, {uc}){COLORS['reset']}")
-        else:
-            print(f"\n{COLORS['yellow']}🪙  CRYPTO CONVERTER (Top 100 Coins, {uc}){COLORS['reset']}")
+        # The whole screen is built as one frame; only changed lines are redrawn
+        with renderer.frame():
+            # Header
+            uc = local_currency().upper()
+            if globals()['platform_type'] == 'android':
+                print(f"\n{COLORS['yellow']}🪙 CRYPTO CONVERTER (Top {len(full_coins)}, {uc}){COLORS['reset']}")
+            else:
+                print(f"\n{COLORS['yellow']}🪙  CRYPTO CONVERTER (Top {len(full_coins)} Coins, {uc}){COLORS['reset']}")
 
-        # Display which API was used last for top-100
-        api_display = active_api if active_api else "N/A"
-        print(f"{COLORS['blue']}API SELECTED = \"{api_display}\"{COLORS['reset']}")
-        print(f"{COLORS['green']}━{'━' * 40}{COLORS['reset']}")
+            # Display which API was used last for top-100
+            api_display = active_api if active_api else "N/A"
+            print(f"{COLORS['blue']}API SELECTED = \"{api_display}\"{COLORS['reset']}")
+            print(provider_registry.status_line())
+            print(f"{COLORS['green']}━{'━' * 40}{COLORS['reset']}")
 
-        # Show coins
-        display_coins_page(current_page, coins)
+            # Show coins; the refresher keeps the visible rows’ prices fresh
+            display_coins_page(current_page, coins)
+            page_start = current_page * COINS_PER_PAGE
+            coins_refresher.watch(coin['id'] for coin in coins[page_start:page_start + COINS_PER_PAGE])
 
-        # Show timestamps at the bottom
-        last_ts = datetime.fromtimestamp(last_update).strftime('%H:%M:%S')
-        next_ts = datetime.fromtimestamp(last_update + REFRESH_RATE).strftime('%H:%M:%S')
-        print(f"\n{COLORS['blue']}Last refresh: {last_ts} | Next refresh: {next_ts}{COLORS['reset']}")
-        print(f"{COLORS['blue']}A: Switch API{COLORS['reset']}")
+            # Show timestamps at the bottom
+            last_ts = datetime.fromtimestamp(last_update).strftime('%H:%M:%S')
+            next_ts = datetime.fromtimestamp(last_update + REFRESH_RATE).strftime('%H:%M:%S')
+            print(f"\n{COLORS['blue']}Last refresh: {last_ts} | Next refresh: {next_ts}{COLORS['reset']}")
+            if last_refresh_failed:
+                print(f"{COLORS['yellow']}⚠️ Last refresh failed on both APIs – showing cached data.{COLORS['reset']}")
+            if local_currency() != globals()['user_currency']:
+                print(f"{COLORS['yellow']}⚠️ No exchange rate for {globals()['user_currency'].upper()} yet – showing {uc}.{COLORS['reset']}")
+            print(f"{COLORS['blue']}A: Switch API  C: Currency{COLORS['reset']}")
+            if STATS_OVERLAY:
+                print('\n'.join(metrics.overlay_lines()))
 
         # Main input (prompt now in cyan)
-        choice = input(f"\n{COLORS['cyan']}Select option (1-{COINS_PER_PAGE}, N/P/S/Q/A): {COLORS['reset']}").strip().lower()
+        choice = input(f"\n{COLORS['cyan']}Select option (1-{COINS_PER_PAGE}, ticker, N/P/S/L/Q/A/C): {COLORS['reset']}").strip().lower()
 
         if choice == 'n':
             total_pages = (len(coins) + COINS_PER_PAGE - 1) // COINS_PER_PAGE
@@ -828,21 +4016,30 @@ def main_session():
             continue
 
         elif choice == 's':
-            search_term = input(f"{COLORS['blue']}Search coin: {COLORS['reset']}").strip()
-            results = search_coins(search_term, full_coins)
+            query = input(f"{COLORS['blue']}Search coin: {COLORS['reset']}").strip()
+            results = search_coins(query, full_coins)
             if results:
                 coins = results
+                search_term = query
                 current_page = 0
             else:
                 print(f"{COLORS['red']}No coins found!{COLORS['reset']}")
                 any_key()
             continue
 
+        elif choice == 'l':
+            live_view(current_page, coins)
+            continue
+
+        elif choice == 'c':
+            currency = currency_menu()
+            if currency:
+                set_currency(currency)   # converted on display, nothing fetched here
+            continue
+
         elif choice == 'a':
             switch_api_menu()
-            # After switching, full_coins & active_api are already updated
-            coins = coins_list[:]
-            current_page = 0
+            # The refresher swaps in the new list once it arrives
             continue
 
         elif choice == 'q':
@@ -862,7 +4059,8 @@ def main_session():
                     selected_coin = coins[coin_index]
                     convert_currency(selected_coin)
                     # After returning, reset the list so searches/pagination clear
-                    coins = full_coins[:]
+                    coins = full_coins
+                    search_term = None
                     current_page = 0
                     continue
 
@@ -870,13 +4068,76 @@ def main_session():
             any_key()
 
         except ValueError:
-            print(f"{COLORS['red']}🔢 Enter a number or command!{COLORS['reset']}")
+            # Not a number: a ticker, id or alias selects that coin directly
+            selected_coin = get_coin_registry(full_coins).get(choice) if choice else None
+            if selected_coin:
+                convert_currency(selected_coin)
+                coins = full_coins
+                search_term = None
+                current_page = 0
+                continue
+            print(f"{COLORS['red']}🔢 Enter a number, ticker or command!{COLORS['reset']}")
             any_key()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Terminal crypto converter.")
+    parser.add_argument('--replay', nargs='+', metavar='ARG',
+                        help="serve a recorded live-price stream: --replay FILE [PORT]")
+    parser.add_argument('--stats', action='store_true',
+                        help="show timings and cache hit rates under the main screen")
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help="keep a Prometheus text-format file of the metrics up to date")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="serve the metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write cProfile stats of every session to PATH")
+    parser.add_argument('--serve', nargs='?', type=int, const=SERVE_PORT, metavar='PORT',
+                        help=f"serve /coins, /coin/ID/history and /convert over HTTP (port {SERVE_PORT})")
+    parser.add_argument('--host', default=SERVE_HOST, help="address for --serve (default: 127.0.0.1)")
+    batch = parser.add_argument_group('headless batch mode')
+    batch.add_argument('--batch', nargs='*', metavar='QUERY',
+                       help="look up coins without the UI: 'btc', 'eth:250' (coin:amount); "
+                            "no QUERY or '-' reads one per line from stdin")
+    batch.add_argument('--currency', help="currency for prices and amounts (default: usd)")
+    batch.add_argument('--amount', type=float, help="default amount to convert into each coin")
+    batch.add_argument('--timeframes', default='', metavar='LIST',
+                       help=f"comma-separated trend windows: {','.join(key for key, _, _ in TIME_FRAMES)}")
+    batch.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    args = parser.parse_args()
+
+    if args.replay:
+        serve_replay(args.replay[0], int(args.replay[1]) if len(args.replay) > 1 else LIVE_REPLAY_PORT)
+        sys.exit(0)
+    STATS_OVERLAY = args.stats or STATS_OVERLAY
+    METRICS_FILE  = args.metrics_file or METRICS_FILE
+    METRICS_PORT  = args.metrics_port or METRICS_PORT
+    PROFILE_FILE  = args.profile or PROFILE_FILE
+    start_metrics_export(METRICS_FILE, METRICS_PORT)
+
+    if args.serve is not None:
+        serve_api(args.host, args.serve)
+        sys.exit(0)
+
+    if args.batch is not None:
+        queries = args.batch if args.batch and args.batch != ['-'] else sys.stdin
+        timeframes = [key.strip() for key in args.timeframes.split(',') if key.strip()]
+        try:
+            rows = batch_query(queries, args.currency, timeframes, args.amount)
+            failed = write_batch(rows, args.format, timeframes)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        except BrokenPipeError:
+            sys.exit(0)   # e.g. piped into `head`
+        sys.exit(1 if failed else 0)
     try:
+        session = 0
         while True:
-            main_session()
+            session += 1
+            if PROFILE_FILE:
+                run_profiled(main_session, session)
+            else:
+                main_session()
     except KeyboardInterrupt:
         print(f"\n{COLORS['red']}👋 Exiting…{COLORS['reset']}")